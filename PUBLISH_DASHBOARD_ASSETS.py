@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Publishes the dashboard assets for every scenario found in the assets folder.
+
+For each pair of '<scenario>_simulation_basic_summary.csv' and
+'<scenario>_simulation_HDF_summary.csv' a pre-merged, typed Parquet snapshot
+'<scenario>_simulation_snapshot.parquet' is written next to the CSVs, so the
+app can load a scenario with a single binary read, together with
+'<scenario>_simulation_aggregates.json' holding the counts, SU total, p95
+thresholds and correlation matrix the overview renders from. A 'manifest.json' listing
+every scenario file with its timestamp, row count, status counts and content
+hash is written last, so the app needs one small request per refresh to know
+what changed. Basic and HDF rows are joined on the storm name; the number of
+storms found in only one of the two files is printed and kept in the manifest.
+
+For each set of scenario variants in dashboard_scenarios.COMPARISON_SETS
+whose scenarios were all published, '<set>_simulation_comparison.parquet'
+joins the variants storm by storm on the Storm ID, with the Max Depth, Max
+Stage BC and Vol Error deltas to the baseline and the status class
+transitions, so the dashboard compares e.g. Base, SLR1 and SLR4 with one read.
+
+Rows that are new or changed since the previous publish are appended to
+'<scenario>_simulation_changes.csv' with the new data version, so a running
+dashboard only reads and applies those rows. The change log starts over when
+the columns change or it grows beyond the size of the snapshot.
+
+Run after the summary CSVs are updated and before pushing the assets:
+
+    python PUBLISH_DASHBOARD_ASSETS.py --assets-dir assets
+"""
+
+import argparse
+from pathlib import Path
+
+import pandas as pd
+import dashboard_scenarios as ds
+import dashboard_utilities as du
+
+
+parser = argparse.ArgumentParser(description="Publish dashboard snapshots for the scenario summaries.")
+parser.add_argument("--assets-dir", default=Path(__file__).parent / "assets", type=Path)
+args = parser.parse_args()
+
+assets_dir = args.assets_dir
+scenario_keys = sorted(
+    p.name[: -len("_simulation_basic_summary.csv")]
+    for p in assets_dir.glob("*_simulation_basic_summary.csv")
+)
+
+print(f"Found scenarios: {scenario_keys}")
+
+manifest_path = assets_dir / du.MANIFEST_NAME
+previous_manifest = du.read_manifest(str(manifest_path)) if manifest_path.exists() else None
+manifest_files = {}
+published_frames = {}
+
+for scenario_key in scenario_keys:
+    names = du.build_asset_names(scenario_key)
+    path_basic = assets_dir / names["basic"]
+    path_hdf = assets_dir / names["hdf"]
+
+    df_basic = pd.read_csv(path_basic, **du.BASIC_CSV_OPTIONS)
+    manifest_files[names["basic"]] = du.build_manifest_entry(path_basic, scenario_key, "basic", df_basic)
+
+    if not path_hdf.exists():
+        print(f"⚠️ Skipping snapshot for {scenario_key}: no HDF summary")
+        continue
+
+    df_hdf = pd.read_csv(path_hdf, **du.HDF_CSV_OPTIONS)
+    manifest_files[names["hdf"]] = du.build_manifest_entry(path_hdf, scenario_key, "hdf", df_hdf)
+
+    merge_report = {}
+    df = du.to_typed_frame(du.merge_summaries(df_basic, df_hdf, merge_report))
+    for kind, keys in merge_report.items():
+        if keys:
+            print(f"⚠️ {scenario_key}: {len(keys):,} {kind} storms, e.g. {keys[:5]}")
+
+    # Change log against the previously published snapshot
+    path_snapshot = assets_dir / names["snapshot"]
+    path_changes = assets_dir / names["changes"]
+    changes_entry = du.manifest_entry(previous_manifest, names["changes"])
+    version = changes_entry.get("version", 0)
+
+    df_old = None
+    if changes_entry and path_snapshot.exists() and path_changes.exists():
+        df_old = du.to_typed_frame(pd.read_parquet(path_snapshot))
+
+    # The log only upserts, so removed storms start a new base version (full reload)
+    restart = (
+        df_old is None
+        or list(df_old.columns) != list(df.columns)
+        or path_changes.stat().st_size > path_snapshot.stat().st_size
+        or len(pd.Index(df_old["Directory"]).difference(df["Directory"])) > 0
+    )
+    changes = df.iloc[:0] if restart else du.diff_snapshots(df_old, df)
+
+    if restart:
+        version += 1
+        path_changes.unlink(missing_ok=True)
+        du.append_changes(path_changes, changes, version)
+        changes_entry = {"version": version, "base_version": version, "offsets": {}, "columns": list(df.columns)}
+        du.write_snapshot(df, path_snapshot)
+    elif len(changes):
+        version += 1
+        offset = du.append_changes(path_changes, changes, version)
+        changes_entry = {
+            "version": version,
+            "base_version": changes_entry["base_version"],
+            "offsets": {**changes_entry["offsets"], str(version): offset},
+            "columns": changes_entry["columns"],
+        }
+        du.write_snapshot(df, path_snapshot)
+
+    manifest_files[names["changes"]] = {
+        **du.build_manifest_entry(path_changes, scenario_key, "changes"),
+        **{k: changes_entry[k] for k in ("version", "base_version", "offsets", "columns")},
+    }
+    manifest_files[names["snapshot"]] = {
+        **du.build_manifest_entry(path_snapshot, scenario_key, "snapshot", df),
+        "merge": {
+            **{kind: len(keys) for kind, keys in merge_report.items()},
+            "examples": merge_report["basic_only"][:5],
+        },
+    }
+    print(f"📄 {scenario_key}: {len(df):,} rows in {names['snapshot']}, "
+          f"{len(changes):,} changed rows logged (version {version})")
+
+    published_frames[scenario_key] = df
+
+    aggregates = du.compute_aggregates(df)
+    aggregates["data_version"] = manifest_files[names["snapshot"]]["sha256"]
+    path_aggregates = assets_dir / names["aggregates"]
+    du.write_aggregates(aggregates, path_aggregates)
+    manifest_files[names["aggregates"]] = du.build_manifest_entry(path_aggregates, scenario_key, "aggregates")
+
+for set_key, comparison_cfg in ds.COMPARISON_SETS.items():
+    variants = comparison_cfg["variants"]
+    missing = [key for key in variants.values() if key not in published_frames]
+    if missing:
+        print(f"⚠️ Skipping comparison {set_key}: {missing} not published")
+        continue
+
+    comparison = du.build_comparison({variant: published_frames[key] for variant, key in variants.items()})
+    name = du.build_comparison_name(set_key)
+    du.write_comparison(comparison, assets_dir / name)
+    manifest_files[name] = du.build_manifest_entry(assets_dir / name, set_key, "comparison", comparison)
+    print(f"📄 {set_key}: {len(comparison):,} storms of {', '.join(variants)} compared in {name}")
+
+du.write_manifest(manifest_path, manifest_files)
+print(f"📄 Manifest with {len(manifest_files)} files written to {du.MANIFEST_NAME}")
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Times the dashboard data path on synthetic scenarios of increasing size.
+
+For each size a synthetic basic / HDF summary pair (see synthetic_scenarios.py)
+is written to a temporary assets folder and every stage the app goes through
+is timed on it: reading and merging the CSVs (what load_merged_dataframe does
+without a snapshot), writing and reading the Parquet snapshot, the derived
+metrics (aggregates, status classes, timeline, facet index, status table, change
+log, comparison of three sea-level variants) and building and serializing the
+per-storm figures in each chart mode.
+
+Each stage is run --repeat times; the best and median wall times are written
+with the library versions to a JSON file, so runs on different machines or
+commits can be compared. Run from the repository root:
+
+    python -m benchmarks.benchmark_dashboard --rows 10000 100000 1000000
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import plotly
+
+import dashboard_figures as dfig
+import dashboard_utilities as du
+from benchmarks.synthetic_scenarios import synthetic_scenario, write_scenario
+
+
+SCENARIO_KEY = "synthetic"
+
+# Share of rows changed between two publishes in the change-log stages
+CHANGED_SHARE = 0.01
+# Fixed number of changed rows for the scaling check of apply_changes, and the most its
+# best time may grow from the smallest to the largest size before the check fails
+FIXED_CHANGES = 10
+APPLY_GROWTH_LIMIT = 3.0
+
+
+def time_stage(results: dict, name: str, func, repeat: int):
+    """
+    Run func repeat times, record best / median seconds under name and return its last result.
+    """
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        value = func()
+        times.append(time.perf_counter() - t0)
+    results[name] = {"best_s": min(times), "median_s": statistics.median(times), "runs": repeat}
+    print(f"  {name:<40} {min(times) * 1000:>10.1f} ms")
+    return value
+
+
+def prepare_per_storm(df: pd.DataFrame):
+    """
+    The frames the per-storm sections of the app chart from.
+    """
+    df = df.copy(deep=False)
+    df["Status Class"] = du.classify_status(df["Status"])
+
+    success_df = df.loc[df["Status"] == "SUCCESS", ["SUs", "Directory"]].reset_index(drop=True)
+    success_df["Storm Number"] = success_df.index + 1
+
+    df_sorted = df if df["Directory"].is_monotonic_increasing else df.sort_values(by="Directory")
+    df_sorted = df_sorted.reset_index(drop=True)
+    df_sorted["Storm Number"] = df_sorted.index + 1
+    return success_df, df_sorted
+
+
+def changed_frame(df: pd.DataFrame, seed: int = 1, n_changed: int = None) -> pd.DataFrame:
+    """
+    df with n_changed rows (default CHANGED_SHARE of them) finishing: Running -> SUCCESS with new metrics.
+    """
+    rng = np.random.default_rng(seed)
+    df = df.copy()
+    if n_changed is None:
+        n_changed = max(1, int(len(df) * CHANGED_SHARE))
+    rows = rng.choice(len(df), size=min(n_changed, len(df)), replace=False)
+    df.loc[rows, "Status"] = "SUCCESS"
+    df.loc[rows, "Vol Error (AF)"] = rng.lognormal(10.5, 0.6, len(rows)).round(0)
+    return df
+
+
+def benchmark_size(n_rows: int, repeat: int, max_full_rows: int, workdir: Path) -> dict:
+    """
+    Time every stage on a synthetic scenario of n_rows storms.
+    """
+    results = {}
+    print(f"{n_rows:,} rows")
+
+    df_basic, df_hdf = time_stage(results, "generate", lambda: synthetic_scenario(n_rows), 1)
+    assets_dir = workdir / f"rows_{n_rows}"
+    assets_dir.mkdir()
+    write_scenario(assets_dir, SCENARIO_KEY, n_rows)
+    names = du.build_asset_names(SCENARIO_KEY)
+
+    # Load path without a snapshot: two CSV reads and the merge
+    time_stage(results, "load.read_basic_csv",
+               lambda: pd.read_csv(assets_dir / names["basic"], **du.BASIC_CSV_OPTIONS), repeat)
+    time_stage(results, "load.read_hdf_csv",
+               lambda: pd.read_csv(assets_dir / names["hdf"], **du.HDF_CSV_OPTIONS), repeat)
+    merged = time_stage(results, "load.merge_summaries", lambda: du.merge_summaries(df_basic, df_hdf), repeat)
+    time_stage(results, "load.load_merged_csv", lambda: du.load_merged(str(assets_dir), SCENARIO_KEY), repeat)
+
+    # Load path with a published snapshot
+    typed = time_stage(results, "snapshot.to_typed_frame", lambda: du.to_typed_frame(merged), repeat)
+    path_snapshot = assets_dir / names["snapshot"]
+    time_stage(results, "snapshot.write", lambda: du.write_snapshot(typed, path_snapshot), repeat)
+    df = time_stage(results, "load.load_merged_snapshot",
+                    lambda: du.load_merged(str(assets_dir), SCENARIO_KEY), repeat)
+    results["snapshot.bytes"] = path_snapshot.stat().st_size
+    results["csv.bytes"] = sum((assets_dir / names[kind]).stat().st_size for kind in ("basic", "hdf"))
+    results["frame.bytes"] = int(df.memory_usage(deep=True).sum())
+
+    # Derived metrics
+    time_stage(results, "derive.compute_aggregates", lambda: du.compute_aggregates(df), repeat)
+    time_stage(results, "derive.classify_status", lambda: du.classify_status(df["Status"]), repeat)
+    success_df, df_sorted = time_stage(results, "derive.per_storm_frames", lambda: prepare_per_storm(df), repeat)
+    time_stage(results, "derive.compute_timeline",
+               lambda: du.compute_timeline(df, reference="2026-02-07"), repeat)
+
+    index = time_stage(results, "facets.build_index", lambda: du.build_facet_index(df_sorted), repeat)
+    selections = {"Status Class": ["Failed"], "SM": [1, 2]}
+    time_stage(results, "facets.filter_mask", lambda: du.filter_mask(index, selections), repeat)
+    time_stage(results, "facets.counts", lambda: du.facet_counts(index, selections), repeat)
+
+    table = time_stage(results, "table.query",
+                       lambda: du.query_status_table(df_sorted, "failed", "Vol Error (AF)", False), repeat)
+    time_stage(results, "table.style_page", lambda: du.style_status_table(table.iloc[:100]).to_html(), repeat)
+
+    df_new = changed_frame(typed)
+    changes = time_stage(results, "changes.diff_snapshots", lambda: du.diff_snapshots(typed, df_new), repeat)
+    indexed = typed.set_index(typed["Directory"].to_numpy())
+    time_stage(results, "changes.apply", lambda: du.apply_changes(indexed, changes), repeat)
+    fixed = du.diff_snapshots(typed, changed_frame(typed, n_changed=FIXED_CHANGES))
+    time_stage(results, "changes.apply_fixed", lambda: du.apply_changes(indexed, fixed), repeat)
+
+    # Storm-by-storm comparison of three sea-level variants of the same storms
+    variants = {suffix: du.to_typed_frame(du.merge_summaries(*synthetic_scenario(n_rows, suffix=suffix)))
+                for suffix in ["Base", "SLR1", "SLR4"]}
+    time_stage(results, "compare.build_comparison", lambda: du.build_comparison(variants), repeat)
+    del variants
+
+    # Figures: build, then serialize as st.plotly_chart does
+    for mode in dfig.CHART_MODES[1:]:
+        if mode == "Full" and n_rows > max_full_rows:
+            continue
+        fig = time_stage(results, f"figure.{mode}.build", lambda: dfig.storm_bar_figure(
+            df_sorted["Storm Number"], df_sorted["Max WSEL Err"], df_sorted["Directory"],
+            title="Max WSEL Error", y_title="Max WSEL Err",
+            groups=df_sorted["Status Class"],
+            group_colors={"Success": "green", "Running": "cyan", "Failed": "red", "Other": "orange"},
+            threshold=float(df_sorted["Max WSEL Err"].quantile(0.95)),
+            individual_groups=["Running", "Failed", "Other"],
+            mode=mode, y_range=[0, 20],
+        ), repeat)
+        time_stage(results, f"figure.{mode}.to_json", fig.to_json, repeat)
+
+    return results
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "plotly": plotly.__version__,
+    }
+
+
+def check_apply_scaling(report: dict):
+    """
+    Fail when applying FIXED_CHANGES rows gets slower with the scenario size.
+    """
+    sizes = sorted(report["sizes"], key=int)
+    if len(sizes) < 2:
+        return
+    smallest, largest = (report["sizes"][n]["changes.apply_fixed"]["best_s"] for n in (sizes[0], sizes[-1]))
+    growth = largest / smallest
+    print(f"  changes.apply_fixed grows {growth:.2f}x from {int(sizes[0]):,} to {int(sizes[-1]):,} rows")
+    assert growth <= APPLY_GROWTH_LIMIT, (
+        f"applying {FIXED_CHANGES} changed rows grew {growth:.2f}x from {int(sizes[0]):,} "
+        f"to {int(sizes[-1]):,} rows (limit {APPLY_GROWTH_LIMIT}x)"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the dashboard data path on synthetic scenarios.")
+    parser.add_argument("--rows", nargs="+", type=int, default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage; the best and median are kept")
+    parser.add_argument("--max-full-rows", type=int, default=100_000,
+                        help="largest size for which the Full (one bar per storm) figure is built")
+    parser.add_argument("--output", type=Path, default=Path(__file__).parent / "results.json")
+    args = parser.parse_args(argv)
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "repeat": args.repeat,
+        "sizes": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="coj_bench_") as workdir:
+        for n_rows in args.rows:
+            report["sizes"][str(n_rows)] = benchmark_size(n_rows, args.repeat, args.max_full_rows, Path(workdir))
+
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"📄 Results written to {args.output}")
+    check_apply_scaling(report)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,517 @@
+# -*- coding: utf-8 -*-
+"""
+Load test of the dashboard: concurrent sessions of a real Streamlit server
+switching between scenarios, against a local stand-in for the asset host.
+
+The assets folder is copied to a temporary folder, published there (see
+PUBLISH_DASHBOARD_ASSETS.py; --no-publish serves the CSVs only) and served
+over HTTP from this process, which counts every request the dashboard makes
+upstream. production_status-app.py is then started with 'streamlit run',
+reading from that host, and --sessions clients connect to it over the same
+websocket protocol as the browser. They open the page together and each
+performs --steps random interactions (switch category, switch scenario,
+change view, show the per-storm sections, change the comparison metric),
+waiting --think-ms between them. The latency of a rerun is the time from
+sending the widget change until the server reports the script finished.
+
+One session opens the page first (the cold start) so that the concurrent
+part measures a warm server, as users would meet it. The report has the
+p50 / p95 / max rerun latency overall and per interaction (also as timed by
+the server), the server memory (idle, after the cold start, its peak under
+load and what that adds per session), the upstream requests by status and
+file kind and the cache hits and misses the server logged. Use it to size the container
+and to check that a caching change does what it should:
+
+    python -m benchmarks.load_test --sessions 8 --steps 20
+
+Sessions do not send the auto reruns of run_every fragments (only used for a
+local ROOT_DIR), nor the interactions of the per-storm sections.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import numpy as np
+import streamlit
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from websockets.asyncio.client import connect
+
+import dashboard_utilities as du
+from benchmarks.benchmark_dashboard import environment
+
+
+REPO_DIR = Path(__file__).resolve().parents[1]
+APP_PATH = REPO_DIR / "production_status-app.py"
+
+# Seconds to wait for the server to answer its health check, and for a rerun
+SERVER_TIMEOUT = 60
+RERUN_TIMEOUT = 300
+
+# Relative frequency of each interaction, among those the current page offers
+ACTION_WEIGHTS = {
+    "category": 2,
+    "scenario": 4,
+    "view": 2,
+    "per_storm": 2,
+    "metric": 1,
+}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentiles(values) -> dict:
+    if not values:
+        return {"n": 0}
+    values = np.asarray(values) * 1000
+    return {
+        "n": len(values),
+        "p50_ms": round(float(np.percentile(values, 50)), 1),
+        "p95_ms": round(float(np.percentile(values, 95)), 1),
+        "max_ms": round(float(values.max()), 1),
+    }
+
+
+# =============================================================================
+# Asset host
+# =============================================================================
+
+def file_kind(path: str) -> str:
+    """
+    'snapshot.parquet', 'basic_summary.csv', 'manifest.json', ... of a requested path.
+    """
+    name = urlsplit(path).path.rsplit("/", 1)[-1]
+    return name.rsplit("_simulation_", 1)[-1]
+
+
+class AssetHost:
+    """
+    Serves a folder over HTTP (with If-Modified-Since) like the raw file host,
+    counting requests by status and file kind. latency_ms delays every answer.
+    """
+
+    def __init__(self, directory: Path, latency_ms: float = 0):
+        self.requests = Counter()
+        self.bytes = Counter()
+        self.lock = threading.Lock()
+        host = self
+
+        class Handler(SimpleHTTPRequestHandler):
+            def do_GET(self):
+                if latency_ms:
+                    time.sleep(latency_ms / 1000)
+                super().do_GET()
+
+            def log_request(self, code="-", size="-"):
+                with host.lock:
+                    host.requests[int(code), file_kind(self.path)] += 1
+
+            def log_message(self, format, *args):
+                # Missing files (404) are expected and counted, not printed
+                pass
+
+            def copyfile(self, source, outputfile):
+                # log_request runs before the body is sent: count the bytes here
+                n = os.fstat(source.fileno()).st_size
+                with host.lock:
+                    host.bytes[file_kind(self.path)] += n
+                super().copyfile(source, outputfile)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), partial(Handler, directory=str(directory)))
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def counts(self) -> dict:
+        with self.lock:
+            return {"requests": Counter(self.requests), "bytes": Counter(self.bytes)}
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def upstream_report(before: dict, after: dict) -> dict:
+    """
+    Requests and bytes served between two AssetHost.counts().
+    """
+    requests = after["requests"] - before["requests"]
+    by_status, by_kind = Counter(), defaultdict(Counter)
+    for (status, kind), n in sorted(requests.items()):
+        by_status[str(status)] += n
+        by_kind[kind][str(status)] += n
+    return {
+        "requests": sum(requests.values()),
+        "by_status": dict(by_status),
+        "by_kind": {kind: dict(counts) for kind, counts in sorted(by_kind.items())},
+        "bytes": sum((after["bytes"] - before["bytes"]).values()),
+    }
+
+
+# =============================================================================
+# Dashboard server
+# =============================================================================
+
+def start_dashboard(port: int, env: dict, log_path: Path) -> subprocess.Popen:
+    """
+    'streamlit run' the app headless on port, its output going to log_path.
+    """
+    with open(log_path, "wb") as log:
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", str(APP_PATH),
+             "--server.headless", "true", "--server.address", "127.0.0.1", "--server.port", str(port),
+             "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false"],
+            cwd=REPO_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+    deadline = time.monotonic() + SERVER_TIMEOUT
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Dashboard exited with {proc.returncode}, see {log_path}")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1).read()
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise TimeoutError(f"Dashboard not healthy after {SERVER_TIMEOUT} s, see {log_path}")
+
+
+def process_memory(pid: int) -> dict:
+    """
+    Current and peak RSS of a process in MB, from /proc (Linux); empty elsewhere.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return {}
+    return {
+        "rss_mb": round(int(fields["VmRSS"].split()[0]) / 1024, 1),
+        "max_rss_mb": round(int(fields["VmHWM"].split()[0]) / 1024, 1),
+    }
+
+
+def server_runs(log_path: Path) -> list:
+    """
+    The 'run' records the dashboard logged (see dashboard_diagnostics).
+    """
+    runs = []
+    for line in log_path.read_text(errors="replace").splitlines():
+        start = line.find("{")
+        if start < 0 or '"event": "run"' not in line:
+            continue
+        try:
+            runs.append(json.loads(line[start:]))
+        except ValueError:
+            pass
+    return runs
+
+
+def server_report(runs: list) -> dict:
+    """
+    Server-side rerun times and cache counts of the given runs.
+    """
+    caches = defaultdict(Counter)
+    for run in runs:
+        for cache, outcomes in run.get("cache", {}).items():
+            caches[cache].update(outcomes)
+    return {
+        "reruns": percentiles([run["total_ms"] / 1000 for run in runs]),
+        "cache": {cache: dict(outcomes) for cache, outcomes in sorted(caches.items())},
+    }
+
+
+# =============================================================================
+# Sessions
+# =============================================================================
+
+class Session:
+    """
+    One browser tab: the widgets of the last rerun and their values, sent back
+    with every rerun as the frontend does.
+    """
+
+    def __init__(self, url: str, rng: random.Random):
+        self.url = url
+        self.rng = rng
+        self.ws = None
+        # key (or label for unkeyed widgets) -> (element type, element proto)
+        self.widgets = {}
+        # widget id -> (value field, value)
+        self.values = {}
+        self.latencies = defaultdict(list)
+        self.errors = []
+
+    async def open(self):
+        self.ws = await connect(self.url, subprotocols=["streamlit"], max_size=None, open_timeout=SERVER_TIMEOUT)
+        await self.rerun("open", {})
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+    def _widget_value(self, element_type: str, widget):
+        if element_type == "checkbox":
+            return "bool_value", widget.value if widget.set_value else widget.default
+        if widget.set_value:
+            return "string_value", widget.raw_value
+        return "string_value", widget.options[widget.default] if widget.options else ""
+
+    def _collect(self, element):
+        """
+        Record a rendered element; the id of a widget, None otherwise.
+        """
+        element_type = element.WhichOneof("type")
+        if element_type == "exception":
+            self.errors.append(f"{element.exception.type}: {element.exception.message}")
+        elif element_type in ("radio", "selectbox", "checkbox"):
+            widget = getattr(element, element_type)
+            key = widget.id.rsplit("-", 1)[-1]
+            self.widgets[widget.label if key == "None" else key] = (element_type, widget)
+            self.values.setdefault(widget.id, self._widget_value(element_type, widget))
+            return widget.id
+        return None
+
+    async def rerun(self, action: str, changes: dict):
+        """
+        Send the widget values with changes ({key or label: value}) applied and
+        wait until the script finished; the latency is recorded under action.
+        """
+        for name, value in changes.items():
+            element_type, widget = self.widgets[name]
+            self.values[widget.id] = ("bool_value" if element_type == "checkbox" else "string_value", value)
+
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        for widget_id, (field, value) in self.values.items():
+            state = msg.rerun_script.widget_states.widgets.add()
+            state.id = widget_id
+            setattr(state, field, value)
+
+        self.widgets = {}
+        t0 = time.perf_counter()
+        await self.ws.send(msg.SerializeToString())
+        seen = set()
+        while True:
+            fmsg = ForwardMsg()
+            fmsg.ParseFromString(await asyncio.wait_for(self.ws.recv(), RERUN_TIMEOUT))
+            kind = fmsg.WhichOneof("type")
+            if kind == "delta" and fmsg.delta.WhichOneof("type") == "new_element":
+                seen.add(self._collect(fmsg.delta.new_element))
+            elif kind == "script_finished" and fmsg.script_finished == ForwardMsg.FINISHED_SUCCESSFULLY:
+                break
+            elif kind == "script_finished" and fmsg.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                self.errors.append("compile error")
+                break
+        self.latencies[action].append(time.perf_counter() - t0)
+        # Widgets that were not rendered again are dropped, as in the browser
+        self.values = {widget_id: value for widget_id, value in self.values.items() if widget_id in seen}
+
+    def _choices(self) -> dict:
+        """
+        {action: changes} of every interaction the current page offers.
+        """
+        rng, choices = self.rng, {}
+
+        def other(name):
+            element_type, widget = self.widgets[name]
+            current = self.values[widget.id][1]
+            options = [o for o in widget.options if o != current]
+            return rng.choice(options) if options else None
+
+        if "view_mode" in self.widgets:
+            choices["view"] = {"view_mode": other("view_mode")}
+        if "Select Scenario Category" in self.widgets:
+            choices["category"] = {"Select Scenario Category": other("Select Scenario Category")}
+        if "single_scenario_radio" in self.widgets:
+            choices["scenario"] = {"single_scenario_radio": other("single_scenario_radio")}
+        if "show_per_storm" in self.widgets:
+            widget = self.widgets["show_per_storm"][1]
+            choices["per_storm"] = {"show_per_storm": not self.values[widget.id][1]}
+        if "comparison_metric" in self.widgets:
+            choices["metric"] = {"comparison_metric": other("comparison_metric")}
+        return {action: changes for action, changes in choices.items() if None not in changes.values()}
+
+    async def interact(self):
+        choices = self._choices()
+        action = self.rng.choices(list(choices), weights=[ACTION_WEIGHTS[a] for a in choices])[0]
+        await self.rerun(action, choices[action])
+
+
+async def run_session(session: Session, barrier: asyncio.Barrier, steps: int, think_ms: float):
+    try:
+        await barrier.wait()
+        await session.open()
+        for _ in range(steps):
+            await asyncio.sleep(session.rng.uniform(0, 2 * think_ms) / 1000)
+            await session.interact()
+    except Exception as e:
+        session.errors.append(repr(e))
+
+
+async def load_phase(url: str, n_sessions: int, steps: int, think_ms: float, seed: int, pid: int) -> dict:
+    """
+    Run n_sessions concurrently and return them with the peak server RSS while they were connected.
+    """
+    sessions = [Session(url, random.Random(seed + i)) for i in range(n_sessions)]
+    barrier = asyncio.Barrier(n_sessions)
+    tasks = [asyncio.create_task(run_session(s, barrier, steps, think_ms)) for s in sessions]
+    peak = 0.0
+    while not all(task.done() for task in tasks):
+        peak = max(peak, process_memory(pid).get("rss_mb", 0.0))
+        await asyncio.sleep(0.1)
+    connected = process_memory(pid)
+    for session in sessions:
+        await session.close()
+    return {"sessions": sessions, "connected": connected, "peak_rss_mb": max(peak, connected.get("rss_mb", 0.0))}
+
+
+# =============================================================================
+# Main
+# =============================================================================
+
+def prepare_assets(assets_dir: Path, workdir: Path, publish: bool) -> Path:
+    served = workdir / "assets"
+    shutil.copytree(assets_dir, served)
+    if publish:
+        subprocess.run([sys.executable, str(REPO_DIR / "PUBLISH_DASHBOARD_ASSETS.py"), "--assets-dir", str(served)],
+                       cwd=REPO_DIR, check=True, stdout=subprocess.DEVNULL)
+    return served
+
+
+def latency_report(sessions) -> dict:
+    by_action = defaultdict(list)
+    for session in sessions:
+        for action, latencies in session.latencies.items():
+            by_action[action].extend(latencies)
+    reruns = [t for action, latencies in by_action.items() if action != "open" for t in latencies]
+    return {"reruns": percentiles(reruns),
+            "by_action": {action: percentiles(latencies) for action, latencies in sorted(by_action.items())}}
+
+
+def print_report(report: dict):
+    latency = report["latency"]
+    print(f"{'':<12} {'n':>6} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10}")
+    for name, stats in [("reruns", latency["reruns"]), *latency["by_action"].items()]:
+        if stats["n"]:
+            print(f"{name:<12} {stats['n']:>6} {stats['p50_ms']:>10.1f} {stats['p95_ms']:>10.1f} {stats['max_ms']:>10.1f}")
+    memory = report["memory"]
+    print(f"Server RSS: idle {memory['idle'].get('rss_mb')} MB, warm {memory['warm'].get('rss_mb')} MB, "
+          f"{report['sessions']} sessions {memory['connected'].get('rss_mb')} MB "
+          f"(peak {memory['peak_rss_mb']} MB, {memory['per_session_mb']} MB per session)")
+    upstream = report["upstream"]["load"]
+    print(f"Upstream during load: {upstream['requests']} requests {upstream['by_status']}, "
+          f"{upstream['bytes'] / 1e6:.1f} MB")
+    if report["errors"]:
+        print(f"⚠️ {len(report['errors'])} errors, e.g. {report['errors'][0]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the dashboard with concurrent sessions.")
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent sessions")
+    parser.add_argument("--steps", type=int, default=20, help="interactions per session after opening the page")
+    parser.add_argument("--think-ms", type=float, default=500, help="mean pause between interactions")
+    parser.add_argument("--assets-dir", type=Path, default=REPO_DIR / "assets")
+    parser.add_argument("--no-publish", action="store_true",
+                        help="serve the summary CSVs without snapshots, aggregates or manifest")
+    parser.add_argument("--upstream-latency-ms", type=float, default=0, help="delay of every asset host answer")
+    parser.add_argument("--prefetch-interval", type=float, default=du.PREFETCH_INTERVAL,
+                        help="seconds between background refreshes of the dashboard")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=Path(__file__).parent / "load_results.json")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="coj_load_") as workdir:
+        workdir = Path(workdir)
+        host = AssetHost(prepare_assets(args.assets_dir, workdir, not args.no_publish), args.upstream_latency_ms)
+        port = free_port()
+        env = dict(os.environ, COJ_ROOT_DIR=host.url, COJ_CACHE_DIR=str(workdir / "cache"),
+                   COJ_LOG_LEVEL="INFO", COJ_PREFETCH_INTERVAL=str(args.prefetch_interval))
+        log_path = workdir / "dashboard.log"
+        proc = start_dashboard(port, env, log_path)
+        url = f"ws://127.0.0.1:{port}/_stcore/stream"
+        try:
+            idle = process_memory(proc.pid)
+            counts_idle = host.counts()
+            print(f"Cold start ({host.url})")
+            cold = asyncio.run(load_phase(url, 1, 0, 0, args.seed - 1, proc.pid))
+            warm = process_memory(proc.pid)
+            n_cold_runs = len(server_runs(log_path))
+            counts_warm = host.counts()
+
+            print(f"{args.sessions} sessions x {args.steps} interactions")
+            t0 = time.perf_counter()
+            load = asyncio.run(load_phase(url, args.sessions, args.steps, args.think_ms, args.seed, proc.pid))
+            wall_s = time.perf_counter() - t0
+            counts_load = host.counts()
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+            host.close()
+        # Reruns the server logged during the concurrent sessions
+        runs = server_runs(log_path)[n_cold_runs:]
+
+    sessions = load["sessions"]
+    connected = load["connected"]
+    per_session = None
+    if warm.get("rss_mb") is not None and load["peak_rss_mb"]:
+        # What each concurrent session adds to the warm server at its peak
+        per_session = round((load["peak_rss_mb"] - warm["rss_mb"]) / args.sessions, 1)
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {**environment(), "streamlit": streamlit.__version__, "cpus": os.cpu_count()},
+        "sessions": args.sessions,
+        "steps": args.steps,
+        "think_ms": args.think_ms,
+        "published": not args.no_publish,
+        "upstream_latency_ms": args.upstream_latency_ms,
+        "prefetch_interval_s": args.prefetch_interval,
+        "wall_s": round(wall_s, 1),
+        "cold_start": percentiles(cold["sessions"][0].latencies["open"]),
+        "latency": latency_report(sessions),
+        "memory": {
+            "idle": idle,
+            "warm": warm,
+            "connected": connected,
+            "peak_rss_mb": load["peak_rss_mb"],
+            "per_session_mb": per_session,
+        },
+        "upstream": {
+            "cold_start": upstream_report(counts_idle, counts_warm),
+            "load": upstream_report(counts_warm, counts_load),
+        },
+        "server": server_report(runs),
+        "errors": [error for session in [*cold["sessions"], *sessions] for error in session.errors],
+    }
+    print_report(report)
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"📄 Results written to {args.output}")
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic basic / HDF summary pairs for benchmarking the dashboard data path.
+
+The frames have the columns, value formats and Directory naming of the real
+'<scenario>_simulation_basic_summary.csv' and '<scenario>_simulation_HDF_summary.csv'
+(e.g. SS0114_PP041_SM4_BF1_SLR4, year-less 'Feb 07 18:14' run times, 'N/A'
+placeholders), at any number of rows. The HDF rows are shuffled and a few
+storms are left out of the HDF summary, as in the published SLR4 files.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+BASIC_COLUMNS = [
+    "Directory", "Status", "Duration", "SUs", "Failure Reason", "Vol Error (AF)", "Vol Error (%)",
+    "Max WSEL Err", "Start Time", "End Time", "Failure Info", "Max WSE (ft)", "Max Depth (ft)",
+    "Max Velocity (ft/s)", "Max Volume (ft^3)", "Max Flow Balance (ft^3/s)", "Max Stage BC (ft)",
+    "Max Inflow BC (cfs)", "Max Cum PRCP (inc)", "Max Cum PRCP (in)",
+]
+
+HDF_COLUMNS = [
+    "folder", "vol_error_af", "vol_error_pct", "start_time", "end_time", "max_wse", "max_depth",
+    "max_face_velocity", "max_velocity", "max_volume", "max_flow_balance", "max_wind_EventCond",
+    "max_prcp_EventCond", "max_bc_flow_EventCond", "max_bc_stage_EventCond", "max_IC_elevation",
+    "unique_manning", "max_cum_prcp",
+]
+
+# Share of each status in the published scenarios
+STATUS_SHARES = {
+    "SUCCESS": 0.975,
+    "UNSTABLE-FAILED": 0.012,
+    "SLURM_TIMEOUT-FAILED": 0.005,
+    "Failed": 0.005,
+    "Running": 0.003,
+}
+
+# Storm-ID ranges of the optimal sample: SS0114-SS1644, PP001-PP500, SM1-SM5
+SS_RANGE = (114, 1645)
+PP_RANGE = (1, 501)
+SM_RANGE = (1, 6)
+
+
+def storm_directories(n_rows: int, suffix: str = "SLR4", seed: int = 0) -> np.ndarray:
+    """
+    n_rows distinct Directory names such as SS0114_PP041_SM4_BF1_SLR4, sorted.
+
+    Beyond the SS x PP x SM combinations of the optimal sample the BF number
+    grows, so any number of rows stays unique.
+    """
+    rng = np.random.default_rng(seed)
+    n_ss, n_pp, n_sm = (hi - lo for lo, hi in (SS_RANGE, PP_RANGE, SM_RANGE))
+    per_bf = n_ss * n_pp * n_sm
+    n_bf = -(-n_rows // per_bf)
+    codes = np.sort(rng.choice(per_bf * n_bf, size=n_rows, replace=False))
+
+    bf, rest = np.divmod(codes, per_bf)
+    ss, rest = np.divmod(rest, n_pp * n_sm)
+    pp, sm = np.divmod(rest, n_sm)
+
+    # Format each component value once and look the labels up per row
+    def _labels(codes, first, fmt):
+        return np.array([fmt.format(v) for v in range(first, first + codes.max() + 1)], dtype=object)[codes]
+
+    names = _labels(ss, SS_RANGE[0], "SS{:04d}")
+    names = names + _labels(pp, PP_RANGE[0], "_PP{:03d}")
+    names = names + _labels(sm, SM_RANGE[0], "_SM{:d}")
+    names = names + _labels(bf, 1, "_BF{:d}")
+    return names + f"_{suffix}"
+
+
+def _run_times(rng, n_rows: int, start: str, days: float):
+    """
+    Year-less start/end stamps ('Feb 07 18:14') of runs spread over a number of days.
+    """
+    t0 = pd.Timestamp(start)
+    starts = t0 + pd.to_timedelta(np.sort(rng.uniform(0, days * 24, n_rows)), unit="h")
+    durations = rng.normal(15.5, 1.0, n_rows).clip(10, 24)
+    ends = starts + pd.to_timedelta(durations, unit="h")
+
+    def _format(times):
+        # strftime once per distinct day and per minute of the day
+        day_codes, days = pd.factorize(times.normalize())
+        minute_of_day = (times.hour * 60 + times.minute).to_numpy()
+        clock = np.array([f" {m // 60:02d}:{m % 60:02d}" for m in range(24 * 60)], dtype=object)
+        return days.strftime("%b %d").to_numpy(dtype=object)[day_codes] + clock[minute_of_day]
+
+    return _format(starts), _format(ends), durations
+
+
+def synthetic_scenario(n_rows: int, suffix: str = "SLR4", seed: int = 0,
+                       missing_hdf_share: float = 0.0016, start: str = "2026-02-07"):
+    """
+    A (df_basic, df_hdf) pair shaped like the published summaries, with df_hdf
+    indexed by 'folder' as read by the app.
+    """
+    rng = np.random.default_rng(seed)
+    directories = storm_directories(n_rows, suffix, seed)
+
+    status = rng.choice(list(STATUS_SHARES), size=n_rows, p=list(STATUS_SHARES.values())).astype(object)
+    success = status == "SUCCESS"
+    running = status == "Running"
+
+    # About 600 runs a day, within the year the year-less stamps can express
+    start_time, end_time, duration = _run_times(rng, n_rows, start, days=min(max(7.0, n_rows / 600), 300.0))
+    end_time[running] = "N/A"
+
+    vol_error_af = rng.lognormal(10.5, 0.6, n_rows).round(0)
+    na = np.full(n_rows, "N/A", dtype=object)
+
+    df_basic = pd.DataFrame({
+        "Directory": directories,
+        "Status": status,
+        "Duration": np.where(success, duration, np.nan),
+        "SUs": np.where(success, (duration * 4).round().astype(int), 0),
+        "Failure Reason": np.where(success | running, None, "UNSTABLE").astype(object),
+        "Vol Error (AF)": vol_error_af,
+        "Vol Error (%)": rng.lognormal(-1.0, 0.5, n_rows).round(4),
+        "Max WSEL Err": np.where(success, rng.lognormal(0.0, 0.5, n_rows).round(2).astype(str), "N/A"),
+        "Start Time": start_time,
+        "End Time": end_time,
+        "Failure Info": na,
+        "Max WSE (ft)": na,
+        "Max Depth (ft)": na,
+        "Max Velocity (ft/s)": na,
+        "Max Volume (ft^3)": na,
+        "Max Flow Balance (ft^3/s)": na,
+        "Max Stage BC (ft)": na,
+        "Max Inflow BC (cfs)": na,
+        "Max Cum PRCP (inc)": np.nan,
+        "Max Cum PRCP (in)": na,
+    }, columns=BASIC_COLUMNS)
+
+    # HDF summary: shuffled, with a few storms missing
+    keep = rng.random(n_rows) >= missing_hdf_share
+    order = rng.permutation(np.flatnonzero(keep))
+    n_hdf = len(order)
+    df_hdf = pd.DataFrame({
+        "folder": directories[order],
+        "vol_error_af": vol_error_af[order],
+        "vol_error_pct": rng.lognormal(-1.0, 0.5, n_hdf),
+        "start_time": "03Jul2000 11:00:00",
+        "end_time": "17Jul2000 00:00:00",
+        "max_wse": rng.normal(320, 10, n_hdf),
+        "max_depth": rng.normal(75, 5, n_hdf),
+        "max_face_velocity": rng.lognormal(4.5, 0.3, n_hdf),
+        "max_velocity": rng.lognormal(10.5, 0.3, n_hdf),
+        "max_volume": rng.lognormal(20.3, 0.2, n_hdf),
+        "max_flow_balance": rng.lognormal(12.0, 0.3, n_hdf),
+        "max_wind_EventCond": np.inf,
+        "max_prcp_EventCond": rng.gamma(2.0, 3.0, n_hdf),
+        "max_bc_flow_EventCond": rng.lognormal(9.0, 0.4, n_hdf),
+        "max_bc_stage_EventCond": rng.normal(8.0, 1.5, n_hdf),
+        "max_IC_elevation": 21.67,
+        "unique_manning": 262648,
+        "max_cum_prcp": np.nan,
+    }, columns=HDF_COLUMNS).set_index("folder")
+
+    return df_basic, df_hdf
+
+
+def write_scenario(assets_dir, scenario_key: str, n_rows: int, **kwargs):
+    """
+    Write a synthetic scenario as the two summary CSVs the app reads.
+    """
+    df_basic, df_hdf = synthetic_scenario(n_rows, **kwargs)
+    df_basic.to_csv(f"{assets_dir}/{scenario_key}_simulation_basic_summary.csv", index=False)
+    df_hdf.to_csv(f"{assets_dir}/{scenario_key}_simulation_HDF_summary.csv")
+    return df_basic, df_hdf
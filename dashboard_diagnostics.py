@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""
+Per-rerun timing, memory and cache counters for the production dashboard.
+
+Code paths are wrapped in span("name") or decorated with @timed("name"); each
+span records when it started within the rerun, how long it took and the
+process memory when it ended. Caches report hits and misses with count().
+start_run() begins a rerun and finish_run() closes it: the rerun is logged as
+one JSON line on the 'coj_dashboard' logger and returned for the diagnostics
+panel. Fragments decorated with @timed_fragment are logged as runs of their own
+when they rerun alone.
+
+Memory is the process RSS and its peak by default. With COJ_TRACEMALLOC=1,
+tracemalloc is started as well and every span records the peak of Python
+allocations while it ran, at the cost of slower allocations.
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+logger = logging.getLogger("coj_dashboard")
+
+TRACEMALLOC = os.environ.get("COJ_TRACEMALLOC", "") not in ("", "0")
+if TRACEMALLOC and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+# Hits / misses of every cache since the process started: (cache, outcome) -> count
+_totals = Counter()
+_totals_lock = threading.Lock()
+
+# Run of the current script thread, set by start_run()
+_current_run = contextvars.ContextVar("coj_diagnostics_run", default=None)
+
+_MB = 1024 * 1024
+
+
+# =============================================================================
+# Memory
+# =============================================================================
+
+def _rss_mb():
+    # Current resident set size from /proc (Linux); None elsewhere
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / _MB, 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _max_rss_mb():
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return round(max_rss / _MB if sys.platform == "darwin" else max_rss / 1024, 1)
+
+
+def memory_usage() -> dict:
+    """
+    Current and peak process memory in MB, plus the traced Python allocations with COJ_TRACEMALLOC=1.
+    """
+    usage = {"rss_mb": _rss_mb(), "max_rss_mb": _max_rss_mb()}
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        usage.update(traced_mb=round(current / _MB, 1), traced_peak_mb=round(peak / _MB, 1))
+    return usage
+
+
+# =============================================================================
+# Runs and spans
+# =============================================================================
+
+class Run:
+    """
+    Spans and cache counts of one rerun.
+    """
+
+    def __init__(self, label: str, **fields):
+        self.id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.fields = fields
+        self.started = time.perf_counter()
+        self.spans = []
+        self.counts = Counter()
+        # Open spans: [name, traced peak seen by nested spans]
+        self.stack = []
+
+    def offset_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+
+def _log(level, event: str, **fields):
+    if logger.isEnabledFor(level):
+        logger.log(level, json.dumps({"event": event, **fields}, default=str))
+
+
+def start_run(label: str = "rerun", **fields) -> Run:
+    """
+    Begin collecting spans for a rerun of the current script thread.
+
+    A previous run of the thread that was not finished (the script was stopped
+    or rerun before the end) is logged as interrupted.
+    """
+    previous = _current_run.get()
+    if previous is not None:
+        finish_run(previous, status="interrupted")
+    run = Run(label, **fields)
+    _current_run.set(run)
+    return run
+
+
+def current_run():
+    return _current_run.get()
+
+
+def finish_run(run: Run = None, **fields) -> dict:
+    """
+    Close a run (the current one by default), log it as a JSON line and return it.
+    """
+    run = run or _current_run.get()
+    if run is None:
+        return None
+    if _current_run.get() is run:
+        _current_run.set(None)
+
+    record = {
+        "run": run.id,
+        "label": run.label,
+        **run.fields,
+        **fields,
+        "total_ms": round(run.offset_ms(), 1),
+        "memory": memory_usage(),
+        "spans": run.spans,
+        "cache": cache_counts(run.counts),
+    }
+    _log(logging.INFO, "run", **record)
+    return record
+
+
+@contextmanager
+def span(name: str, **fields):
+    """
+    Time the enclosed block as one step of the current rerun.
+    """
+    run = _current_run.get()
+    if run is None:
+        # Outside a rerun (e.g. a worker thread): only the debug line
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            _log(logging.DEBUG, "span", run=None, name=name,
+                 ms=round((time.perf_counter() - t0) * 1000, 2), **fields)
+        return
+
+    start_ms = run.offset_ms()
+    depth = len(run.stack)
+    frame = [name, 0]
+    run.stack.append(frame)
+    if TRACEMALLOC:
+        tracemalloc.reset_peak()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        run.stack.pop()
+        entry = {
+            "name": name,
+            "start_ms": round(start_ms, 2),
+            "ms": round(run.offset_ms() - start_ms, 2),
+            "depth": depth,
+            "rss_mb": _rss_mb(),
+            **fields,
+        }
+        if TRACEMALLOC:
+            # Nested spans reset the peak; keep the highest one they saw
+            peak = max(tracemalloc.get_traced_memory()[1], frame[1])
+            entry["traced_peak_mb"] = round(peak / _MB, 2)
+            if run.stack:
+                run.stack[-1][1] = max(run.stack[-1][1], peak)
+        if error is not None:
+            entry["error"] = error
+        run.spans.append(entry)
+        _log(logging.DEBUG, "span", run=run.id, **entry)
+
+
+def timed(name: str = None):
+    """
+    Decorator form of span(), named after the function by default.
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timed_fragment(name: str = None):
+    """
+    timed() for a Streamlit fragment: a span of the full rerun, or a run of its
+    own (logged on finishing) when the fragment reruns alone.
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_run.get() is not None:
+                with span(span_name):
+                    return func(*args, **kwargs)
+            run = start_run(f"fragment:{span_name}")
+            try:
+                with span(span_name):
+                    return func(*args, **kwargs)
+            finally:
+                finish_run(run)
+        return wrapper
+    return decorator
+
+
+# =============================================================================
+# Cache counters
+# =============================================================================
+
+def count(cache: str, outcome: str = "hit"):
+    """
+    Record a lookup of a cache ('hit', 'miss' or another outcome, e.g. an HTTP 304).
+    """
+    with _totals_lock:
+        _totals[cache, outcome] += 1
+    run = _current_run.get()
+    if run is not None:
+        run.counts[cache, outcome] += 1
+
+
+def cache_counts(counts: Counter = None) -> dict:
+    """
+    {cache: {outcome: count}} of a run's counts, or since the process started.
+    """
+    if counts is None:
+        with _totals_lock:
+            counts = Counter(_totals)
+    nested = {}
+    for (cache, outcome), n in sorted(counts.items()):
+        nested.setdefault(cache, {})[outcome] = n
+    return nested
+
+
+def log_event(event: str, **fields):
+    """
+    Log one JSON line for work done outside a rerun, e.g. a background refresh.
+    """
+    _log(logging.INFO, event, **fields)
+
+
+# =============================================================================
+# Logging
+# =============================================================================
+
+def configure_logging(level: str = None):
+    """
+    Send the JSON lines to stderr (once per process) at COJ_LOG_LEVEL, INFO by
+    default; DEBUG adds one line per span.
+    """
+    level = level or os.environ.get("COJ_LOG_LEVEL", "INFO")
+    logger.setLevel(level.upper())
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
@@ -0,0 +1,480 @@
+# -*- coding: utf-8 -*-
+"""
+Plotly figure builders for the per-storm charts of the production dashboard.
+
+A scenario has up to 10,000 storms and the dashboard draws about nine
+one-bar-per-storm charts, so every builder can render in one of three modes:
+
+- Full: one bar per storm with the Directory in the hover (original look).
+- WebGL: one WebGL marker per storm, without per-point hover text.
+- Binned: the max of consecutive storms per bin.
+
+In the WebGL and Binned modes the storms above the threshold (p95), and the
+storms of the groups passed in individual_groups, are still drawn one by one
+with their Directory in the hover.
+
+Figures are built through cached_figure, which reuses the figure built on a
+previous rerun (by any session) when the chart inputs and options are the same.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+import dashboard_diagnostics as diag
+
+
+CHART_MODES = ["Auto", "Full", "WebGL", "Binned"]
+
+# Above this many storms 'Auto' switches from Full to Binned
+MAX_FULL_POINTS = 2000
+
+# Number of bins in Binned mode
+N_BINS = 200
+
+
+# Status colors of the status count bar chart and of the pie chart
+STATUS_BAR_COLORS = {
+    "SUCCESS": "#90EE90",
+    "Running": "skyblue",
+    "UNSTABLE-FAILED": "#FF7F7F",
+    "SLURM_TIMEOUT-FAILED": "#FFD700",
+    "DISK-FAILED": "#FFD700",
+    "HDF-FAILED": "#FFD700"
+}
+STATUS_PIE_COLORS = {
+    "SUCCESS": "#90EE90",        # Light Green (Success)
+    "Running": "skyblue",        # Light Blue (In Progress)
+    "UNSTABLE-FAILED": "#FF7F7F",# Soft Red (Unstable Failure)
+    "SLURM_TIMEOUT-FAILED": "#FFA500", # Orange (Timeout)
+    "DISK-FAILED": "#FFD700",    # Gold (Disk Issue)
+    "HDF-FAILED": "#FFD700",     # Gold (HDF Issue)
+    "FAILED": "#FF6347"          #
+}
+
+# Figures kept by cached_figure, least recently used first
+MAX_CACHED_FIGURES = 64
+
+
+# =============================================================================
+# Figure cache
+# =============================================================================
+
+_figures = OrderedDict()
+_figures_lock = threading.Lock()
+
+
+def content_hash(*parts) -> str:
+    """
+    Hash of chart inputs: arrays and Series by content, anything else by repr.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, (np.ndarray, pd.Series, pd.Index)):
+            values = np.asarray(part)
+            if values.dtype.kind in "OUS":
+                values = pd.util.hash_array(values.astype(object))
+            h.update(str(values.dtype).encode())
+            h.update(np.ascontiguousarray(values).tobytes())
+        else:
+            h.update(repr(part).encode())
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def cached_figure(namespace: str, build, *args, **kwargs):
+    """
+    build(*args, **kwargs), reused while namespace (the scenario), the argument
+    contents and the options are unchanged.
+
+    The figure is shared between reruns and sessions: do not modify it after
+    this call, pass the layout options to the builder instead.
+    """
+    options = [part for item in sorted(kwargs.items()) for part in item]
+    key = content_hash(namespace, build.__qualname__, *args, *options)
+    with _figures_lock:
+        fig = _figures.get(key)
+        if fig is not None:
+            _figures.move_to_end(key)
+            diag.count("figures", "hit")
+            return fig
+
+    diag.count("figures", "miss")
+    with diag.span(f"build {build.__name__}"):
+        fig = build(*args, **kwargs)
+    with _figures_lock:
+        _figures[key] = fig
+        while len(_figures) > MAX_CACHED_FIGURES:
+            _figures.popitem(last=False)
+    return fig
+
+
+# =============================================================================
+# Overview charts (from the scenario aggregates)
+# =============================================================================
+
+def completion_figure(completed: int, running: int, waiting: int, total: int):
+    """
+    Horizontal stacked bar: Completed vs Running vs Waiting.
+    """
+    fig = go.Figure()
+    for name, count, color in [("Completed", completed, "lightgreen"),
+                               ("Running", running, "skyblue"),
+                               ("Waiting", waiting, "lightgray")]:
+        fig.add_trace(go.Bar(
+            y=["Simulations"],
+            x=[count],
+            name=name,
+            orientation='h',
+            marker=dict(color=color)
+        ))
+
+    fig.update_layout(
+        barmode='stack',
+        xaxis_title="Count",
+        xaxis=dict(range=[0, total]),
+        height=225
+    )
+    return fig
+
+
+def status_count_figure(status_counts):
+    """
+    One bar per status from [status, count] pairs.
+    """
+    fig = go.Figure()
+    for status, count in status_counts:
+        fig.add_trace(go.Bar(
+            x=[status],
+            y=[count],
+            name=status,
+            marker_color=STATUS_BAR_COLORS.get(status, "orange"),
+            text=count,
+            textposition="outside"
+        ))
+
+    fig.update_layout(
+        title="Status Type Counts",
+        xaxis_title="Status",
+        yaxis_title="Count",
+        showlegend=False,
+        height=500,
+        yaxis=dict(range=[0, 10000])  # Set y-axis range
+    )
+    return fig
+
+
+def status_pie_figure(status_counts):
+    """
+    Pie chart of the statuses from [status, count] pairs.
+    """
+    return px.pie(
+        pd.DataFrame(status_counts, columns=["Status", "Count"]),
+        names="Status",
+        values="Count",
+        title="Failure vs Success Distribution",
+        color="Status",
+        color_discrete_map=STATUS_PIE_COLORS
+    )
+
+
+def correlation_figure(columns, values):
+    """
+    Heatmap of a correlation matrix given as column names and rows of values.
+    """
+    z = np.array(values, dtype=float).reshape(len(columns), len(columns))
+    return go.Figure(data=go.Heatmap(
+        z=z,
+        x=columns,
+        y=columns,
+        colorscale='Viridis'
+    ))
+
+
+# =============================================================================
+# Timeline charts
+# =============================================================================
+
+def running_jobs_figure(times, running):
+    """
+    Step line of the number of running jobs over time.
+    """
+    fig = go.Figure(go.Scatter(
+        x=times, y=running, mode="lines", line=dict(shape="hv", color="steelblue"), name="Running Jobs",
+    ))
+    fig.update_layout(
+        title="Running Jobs (max per hour)",
+        xaxis_title="Time",
+        yaxis_title="Running Jobs",
+        height=350,
+    )
+    return fig
+
+
+def throughput_figure(times, completions, su_burn):
+    """
+    Completions per interval (bars) with the rolling SU burn rate on a second axis.
+    """
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=times, y=completions, name="Completions", marker=dict(color="lightgreen")))
+    fig.add_trace(go.Scatter(
+        x=times, y=su_burn, name="SU Burn (SU/h, rolling)", mode="lines",
+        line=dict(color="darkorange"), yaxis="y2",
+    ))
+    fig.update_layout(
+        title="Completions per Hour and SU Burn Rate",
+        xaxis_title="Time",
+        yaxis=dict(title="Completions"),
+        yaxis2=dict(title="SU/h", overlaying="y", side="right", showgrid=False),
+        legend=dict(orientation="h", y=-0.25),
+        height=400,
+    )
+    return fig
+
+
+# =============================================================================
+# Comparison charts (storm by storm between scenario variants)
+# =============================================================================
+
+# Colors of the non-baseline variants, in order
+VARIANT_COLORS = ["steelblue", "darkorange", "seagreen", "orchid"]
+
+
+def delta_histogram_figure(variants, *deltas, title: str, x_title: str, n_bins: int = 60):
+    """
+    Overlaid histograms of the per-storm deltas of each variant, on shared bins.
+
+    The counts are binned here, so the figure holds n_bins bars per variant
+    whatever the number of storms.
+    """
+    finite = {}
+    for variant, values in zip(variants, deltas):
+        values = np.asarray(values, dtype=float)
+        finite[variant] = values[np.isfinite(values)]
+    stacked = np.concatenate([*finite.values(), np.array([])])
+    edges = np.histogram_bin_edges(stacked if len(stacked) else [0.0, 1.0], bins=n_bins)
+    centers = (edges[:-1] + edges[1:]) / 2
+
+    fig = go.Figure()
+    for i, (variant, values) in enumerate(finite.items()):
+        counts, _ = np.histogram(values, bins=edges)
+        fig.add_trace(go.Bar(
+            x=centers,
+            y=counts,
+            width=np.diff(edges),
+            name=variant,
+            opacity=0.6,
+            marker_color=VARIANT_COLORS[i % len(VARIANT_COLORS)],
+            customdata=np.column_stack([edges[:-1], edges[1:]]),
+            hovertemplate="%{customdata[0]:.3g} to %{customdata[1]:.3g}: %{y:,} storms<extra>%{fullData.name}</extra>",
+        ))
+    fig.add_vline(x=0, line_dash="dash", line_color="gray")
+    fig.update_layout(
+        title=title,
+        xaxis_title=x_title,
+        yaxis_title="Storms",
+        barmode="overlay",
+        height=400,
+    )
+    return fig
+
+
+def transition_figure(counts, from_classes, to_classes, title: str, x_title: str, y_title: str):
+    """
+    Heatmap of storm counts by status class in the baseline (rows, from_classes)
+    and in a variant (columns, to_classes).
+    """
+    fig = go.Figure(data=go.Heatmap(
+        z=counts,
+        x=list(to_classes),
+        y=list(from_classes),
+        text=counts,
+        texttemplate="%{text:,}",
+        colorscale="Blues",
+        showscale=False,
+        hovertemplate="%{y} → %{x}: %{z:,} storms<extra></extra>",
+    ))
+    fig.update_layout(
+        title=title,
+        xaxis_title=x_title,
+        yaxis_title=y_title,
+        yaxis=dict(autorange="reversed"),
+        height=350,
+    )
+    return fig
+
+
+# =============================================================================
+# Diagnostics charts
+# =============================================================================
+
+def waterfall_figure(spans):
+    """
+    Horizontal bars from each span's start to its end within a rerun, in start
+    order, indented by nesting depth.
+    """
+    spans = sorted(spans, key=lambda s: (s["start_ms"], s["depth"]))
+    labels = [f"{i + 1:>2}. " + "· " * s["depth"] + s["name"] for i, s in enumerate(spans)]
+    fig = go.Figure(go.Bar(
+        y=labels,
+        x=[s["ms"] for s in spans],
+        base=[s["start_ms"] for s in spans],
+        orientation="h",
+        marker=dict(color=[s["depth"] for s in spans], colorscale="Blues_r", cmin=0, cmax=4),
+        hovertemplate="%{y}<br>%{base:.1f} – %{x:.1f} ms<extra></extra>",
+    ))
+    fig.update_layout(
+        title="Rerun Waterfall",
+        xaxis_title="ms since the rerun started",
+        yaxis=dict(autorange="reversed"),
+        height=max(250, 22 * len(spans) + 100),
+        margin=dict(l=10),
+    )
+    return fig
+
+
+# =============================================================================
+# Per-storm charts
+# =============================================================================
+
+def resolve_chart_mode(mode: str, n_points: int, max_points: int = MAX_FULL_POINTS) -> str:
+    """
+    Turn 'Auto' into Full or Binned depending on the number of points.
+    """
+    if mode != "Auto":
+        return mode
+    return "Full" if n_points <= max_points else "Binned"
+
+
+def bin_max(x, y, n_bins: int = N_BINS):
+    """
+    Max of y over consecutive blocks of points.
+
+    Returns (bin_center, bin_max, bin_first, bin_last), where bin_first and
+    bin_last are the first and last x in each bin.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n == 0:
+        empty = np.array([])
+        return empty, empty, empty, empty
+
+    bin_size = max(1, int(np.ceil(n / n_bins)))
+    starts = np.arange(0, n, bin_size)
+
+    # NaN-aware max per block without a Python loop
+    y_filled = np.where(np.isnan(y), -np.inf, y)
+    maxima = np.maximum.reduceat(y_filled, starts)
+    maxima[np.isneginf(maxima)] = np.nan
+
+    ends = np.minimum(starts + bin_size, n) - 1
+    return (x[starts] + x[ends]) / 2, maxima, x[starts], x[ends]
+
+
+def storm_bar_figure(x, y, directories, title: str, y_title: str,
+                     groups=None, group_colors: dict = None, colorscale: str = None,
+                     threshold: float = None, threshold_label: str = None,
+                     individual_groups=(), mode: str = "Auto",
+                     max_points: int = MAX_FULL_POINTS, n_bins: int = N_BINS,
+                     y_range=None, showlegend: bool = None):
+    """
+    One-value-per-storm chart.
+
+    x, y, directories and groups are aligned arrays. Points are split into one
+    trace per group (colored by group_colors) instead of per-point color lists;
+    without groups, bars are colored by value with colorscale. A dashed line is
+    drawn at threshold when threshold_label is given.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    directories = np.asarray(directories, dtype=object)
+    mode = resolve_chart_mode(mode, len(y), max_points)
+
+    if groups is None:
+        groups = np.full(len(y), y_title, dtype=object)
+        group_colors = {y_title: None}
+    groups = np.asarray(groups, dtype=object)
+    group_colors = group_colors or {}
+    group_names = [g for g in group_colors if (groups == g).any()]
+    group_names += [g for g in dict.fromkeys(groups) if g not in group_names]
+
+    def _marker(sel, color):
+        if color is None:
+            return dict(color=y[sel], colorscale=colorscale, showscale=False)
+        return dict(color=color)
+
+    hover_directory = "<b>Storm:</b> %{customdata}<br>" + f"<b>{y_title}:</b> %{{y}}<extra></extra>"
+    hover_number = "<b>Storm #</b>%{x}<br>" + f"<b>{y_title}:</b> %{{y}}<extra></extra>"
+
+    fig = go.Figure()
+
+    if mode == "Full":
+        for g in group_names:
+            sel = groups == g
+            fig.add_trace(go.Bar(
+                x=x[sel], y=y[sel], name=str(g),
+                marker=_marker(sel, group_colors.get(g)),
+                customdata=directories[sel],
+                hovertemplate=hover_directory,
+            ))
+    else:
+        individual = np.isin(groups, list(individual_groups))
+        if threshold is not None:
+            individual |= y > threshold
+
+        if mode == "WebGL":
+            for g in group_names:
+                sel = (groups == g) & ~individual
+                fig.add_trace(go.Scattergl(
+                    x=x[sel], y=y[sel], name=str(g), mode="markers",
+                    marker=dict(_marker(sel, group_colors.get(g)), size=3),
+                    hovertemplate=hover_number,
+                ))
+        else:
+            centers, maxima, first, last = bin_max(x, y, n_bins)
+            fig.add_trace(go.Bar(
+                x=centers, y=maxima, name="Max per bin",
+                width=(last - first + 1) if len(first) else None,
+                marker=dict(color="lightsteelblue"),
+                customdata=np.stack([first, last], axis=-1) if len(first) else None,
+                hovertemplate="<b>Storms #</b>%{customdata[0]}–%{customdata[1]}<br>"
+                              + f"<b>Max {y_title}:</b> %{{y}}<extra></extra>",
+            ))
+
+        # Storms above the threshold and in highlighted groups keep their Directory hover
+        for g in group_names:
+            sel = (groups == g) & individual
+            if not sel.any():
+                continue
+            color = group_colors.get(g)
+            fig.add_trace(go.Scattergl(
+                x=x[sel], y=y[sel], name=str(g) if len(group_names) > 1 else "Above threshold",
+                mode="markers",
+                marker=dict(color=color if color is not None else "purple", size=6),
+                customdata=directories[sel],
+                hovertemplate=hover_directory,
+            ))
+
+    if threshold is not None and threshold_label is not None and len(x):
+        # Two points are enough for a horizontal line
+        fig.add_trace(go.Scatter(
+            x=[x.min(), x.max()], y=[threshold, threshold],
+            mode="lines", line=dict(color="black", dash="dash"), name=threshold_label,
+        ))
+
+    fig.update_layout(
+        title=title,
+        xaxis_title="Storm Number",
+        yaxis_title=y_title,
+    )
+    if y_range is not None:
+        fig.update_yaxes(range=list(y_range))
+    if showlegend is not None:
+        fig.update_layout(showlegend=showlegend)
+    return fig
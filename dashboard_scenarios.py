@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Scenario registry and data access shared by the production dashboard and the
+status API (status_api.py).
+
+Where the data is read from comes from the environment (COJ_ROOT_DIR and
+friends), so both serve the same scenarios from the same folder or URL, each
+through one background prefetcher per process. Nothing here depends on
+Streamlit.
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import requests
+
+import dashboard_diagnostics as diag
+import dashboard_utilities as du
+
+
+# =============================================================================
+# Scenario configuration
+# =============================================================================
+
+# Centralized scenario registry
+SCENARIOS = {
+    "erdc_baseline_reruns": {
+         "title": "ERDC BASELINE",
+         "category": "Base",
+         "start_date": datetime(2026, 1, 1),
+         "completion_date_projected": datetime(2026, 1, 15),
+         "completion_date_actual": datetime(2026, 1, 15),
+         "total_simulations": 505,
+     },
+    "a_optimal_sample_base": {
+        "title": "Optimal Sample - BASE - NO SLR",
+        "category": "Tropical Cyclones",
+        "start_date": datetime(2026, 1, 1),
+        "completion_date_projected": datetime(2026, 1, 15),
+        "completion_date_actual": datetime(2026, 1, 25),
+        "total_simulations": 10000,
+    },
+    "optimal_sample_SLR4": {
+        "title": "Optimal Sample - SLR - IntHigh 2070",
+        "category": "Tropical Cyclones",
+        "start_date": datetime(2026, 2, 6),
+        "completion_date_projected": datetime(2026, 2, 24),
+        "completion_date_actual": datetime(2026, 3, 3),
+        "total_simulations": 10000,
+    },
+    "optimal_sample_SLR1": {
+        "title": "Optimal Sample - SLR - IntLow 2040",
+        "category": "Tropical Cyclones",
+        "start_date": datetime(2026, 3, 23),
+        "completion_date_projected": datetime(2026, 4, 10),
+        "completion_date_actual": datetime(2026, 4, 23),
+        "total_simulations": 10000,
+    },
+    "synthetic_nontc_base": {
+        "title": "Synthetic Non-TC - BASE - NO SLR",
+        "category": "Non-Tropical Cyclones",
+        "start_date": datetime(2026, 5, 14),
+        "completion_date_projected": datetime(2026, 5, 20),
+        "completion_date_actual": datetime(2026, 5, 20),
+        "total_simulations": 3648,
+    },
+    "synthetic_nontc_slr1": {
+        "title": "Synthetic Non-TC - SLR - IntLow 2040",
+        "category": "Non-Tropical Cyclones",
+        "start_date": datetime(2026, 5, 23),
+        "completion_date_projected": datetime(2026, 5, 28),
+        "completion_date_actual": datetime(2026, 5, 26),
+        "total_simulations": 3648,
+    },
+    "synthetic_nontc_slr4": {
+        "title": "Synthetic Non-TC - SLR - IntHigh 2070",
+        "category": "Non-Tropical Cyclones",
+        "start_date": datetime(2026, 5, 27),
+        "completion_date_projected": datetime(2026, 5, 31),
+        "completion_date_actual": datetime(2026, 5, 31),
+        "total_simulations": 3648,
+    },
+
+
+}
+
+def group_scenarios(scenarios):
+    grouped = defaultdict(dict)
+    for key, cfg in scenarios.items():
+        category = cfg.get("category", "Other")
+        grouped[category][key] = cfg
+    return grouped
+
+
+GROUPED_SCENARIOS = group_scenarios(SCENARIOS)
+
+# Scenarios that ran the same storms under different sea levels, compared storm
+# by storm (joined on the Directory name without its suffix); the first variant
+# is the baseline of the deltas
+COMPARISON_SETS = {
+    "optimal_sample": {
+        "title": "Optimal Sample",
+        "variants": {"Base": "a_optimal_sample_base", "SLR1": "optimal_sample_SLR1", "SLR4": "optimal_sample_SLR4"},
+    },
+    "synthetic_nontc": {
+        "title": "Synthetic Non-TC",
+        "variants": {"Base": "synthetic_nontc_base", "SLR1": "synthetic_nontc_slr1", "SLR4": "synthetic_nontc_slr4"},
+    },
+}
+
+# Default scenario key (as requested)
+DEFAULT_SCENARIO_KEY = "synthetic_nontc_slr4"
+
+# Dates of the registry, as reported by the status API
+SCENARIO_DATE_FIELDS = ["start_date", "completion_date_projected", "completion_date_actual"]
+
+
+# =============================================================================
+# Data location
+# =============================================================================
+
+# Data root: the published assets on GitHub, or a local folder (e.g. the shared
+# analysis directory on the cluster) through the COJ_ROOT_DIR environment variable
+ROOT_DIR = os.environ.get(
+    "COJ_ROOT_DIR",
+    r"https://raw.githubusercontent.com/akhalid-twi/COJ-production/refs/heads/main/assets",
+)
+
+# A local ROOT_DIR is watched for changes instead of re-read on a timer;
+# set COJ_WATCH_POLLING=1 where inotify does not see writes (network file systems)
+LOCAL_MODE = not du.is_url(ROOT_DIR)
+WATCH_POLLING = os.environ.get("COJ_WATCH_POLLING", "") not in ("", "0")
+
+# Seconds between two background refreshes of remote data
+PREFETCH_INTERVAL = float(os.environ.get("COJ_PREFETCH_INTERVAL", du.PREFETCH_INTERVAL))
+
+
+def start_watcher():
+    # One watcher per process; None for remote data
+    return du.watch_assets(ROOT_DIR, polling=WATCH_POLLING) if LOCAL_MODE else None
+
+
+def start_prefetcher() -> du.ScenarioPrefetcher:
+    """
+    The process-wide prefetcher of every scenario and comparison set, started after the watcher it follows in local mode.
+    """
+    start_watcher()
+    comparison_sets = {set_key: cfg["variants"] for set_key, cfg in COMPARISON_SETS.items()}
+    return du.prefetch_scenarios(ROOT_DIR, SCENARIOS, interval=PREFETCH_INTERVAL, comparison_sets=comparison_sets)
+
+
+# Manifests read on the request path: root_dir -> (watcher version, time read, manifest)
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+def current_manifest(prefetcher: du.ScenarioPrefetcher) -> dict:
+    """
+    Manifest to load data with: that of the last background refresh for remote
+    data, otherwise read once per change of a watched folder (once per
+    CACHE_TTL before the first refresh). None if not published.
+    """
+    watcher = du.get_watcher(prefetcher.root_dir)
+    if watcher is None and prefetcher.ready:
+        return prefetcher.manifest
+
+    version = watcher.version(None) if watcher is not None else None
+    with _manifests_lock:
+        cached = _manifests.get(prefetcher.root_dir)
+    if cached is not None and cached[0] == version and (watcher is not None or time.time() - cached[1] < du.CACHE_TTL):
+        return cached[2]
+
+    # One small request covers every scenario
+    try:
+        manifest = du.read_manifest(f"{prefetcher.root_dir}/{du.MANIFEST_NAME}")
+    except Exception:
+        manifest = None
+    with _manifests_lock:
+        _manifests[prefetcher.root_dir] = (version, time.time(), manifest)
+    return manifest
+
+
+# =============================================================================
+# Last updated
+# =============================================================================
+
+# GitHub commit times: (owner, repo, path) -> (time fetched, datetime or None)
+_last_modified = {}
+_last_modified_lock = threading.Lock()
+
+
+@diag.timed("github last_modified")
+def get_last_modified(owner: str, repo: str, path: str):
+    """
+    Get last commit timestamp for a given path in a GitHub repo.
+    Returns an aware datetime in UTC or None if unavailable. Answers are
+    reused for CACHE_TTL seconds (the API allows 60 anonymous requests an hour).
+    """
+    key = (owner, repo, path)
+    with _last_modified_lock:
+        cached = _last_modified.get(key)
+    if cached is not None and time.time() - cached[0] < du.CACHE_TTL:
+        return cached[1]
+
+    url = f"https://api.github.com/repos/{owner}/{repo}/commits"
+    params = {"path": path, "page": 1, "per_page": 1}
+
+    dt = None
+    try:
+        r = requests.get(url, params=params, timeout=10)
+        data = r.json() if r.status_code == 200 else None
+        if data:
+            timestamp = data[0]["commit"]["committer"]["date"]  # e.g. "2026-02-20T19:22:37Z"
+            dt = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    except Exception:
+        dt = None
+
+    with _last_modified_lock:
+        _last_modified[key] = (time.time(), dt)
+    return dt
+
+
+def last_updated_dt(scenario_key: str, manifest: dict = None):
+    """
+    Detects last modified time for the basic summary CSV.
+    Uses the published manifest, falling back to the file time for a local ROOT_DIR
+    and to the GitHub API for GitHub raw URLs.
+    """
+    csv_basic = du.build_asset_names(scenario_key)["basic"]
+
+    modified_datetime = du.manifest_updated_dt(manifest, csv_basic)
+    if modified_datetime is not None:
+        return modified_datetime
+
+    if "githubusercontent" not in ROOT_DIR:
+        try:
+            modified_timestamp = os.path.getmtime(f"{ROOT_DIR}/{csv_basic}")
+            modified_datetime = datetime.fromtimestamp(modified_timestamp, tz=timezone.utc)
+        except Exception:
+            modified_datetime = None
+    else:
+        # Path within repo
+        modified_datetime = get_last_modified(
+            owner="akhalid-twi",
+            repo="COJ-production",
+            path=f"assets/{csv_basic}",
+        )
+    return modified_datetime
+
+
+# =============================================================================
+# Status summaries
+# =============================================================================
+
+def scenario_status(scenario_key: str, aggregates: dict, manifest: dict = None) -> dict:
+    """
+    Counts, progress, SU total and failure breakdown of one scenario, as JSON values.
+    """
+    cfg = SCENARIOS[scenario_key]
+    status_counts = dict(aggregates["status_counts"])
+    updated = last_updated_dt(scenario_key, manifest)
+    return {
+        "scenario": scenario_key,
+        "title": cfg["title"],
+        "category": cfg.get("category", "Other"),
+        **{field: cfg[field].date().isoformat() for field in SCENARIO_DATE_FIELDS if cfg.get(field)},
+        **du.summarize_aggregates(aggregates, cfg.get("total_simulations")),
+        "success": aggregates["success"],
+        "status_counts": status_counts,
+        "failures": {
+            "by_status": {status: n for status, n in status_counts.items() if "failed" in status.lower()},
+            # Aggregates published before failure reasons were counted have none
+            "by_reason": dict(aggregates.get("failure_reasons", [])),
+        },
+        "last_updated": updated.isoformat() if updated is not None else None,
+    }
@@ -0,0 +1,1635 @@
+# -*- coding: utf-8 -*-
+"""
+Data helpers shared by the production dashboard and the asset publisher.
+
+The functions here do not depend on Streamlit so that they can be used from
+scripts running next to the analysis outputs as well as from the app.
+"""
+
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import requests
+
+import dashboard_diagnostics as diag
+
+
+# =============================================================================
+# Asset naming
+# =============================================================================
+
+# Columns of the basic summary that hold free text; everything else is numeric
+TEXT_COLUMNS = ["Directory", "Status", "Failure Reason", "Start Time", "End Time", "Failure Info",
+                "Storm ID", "Scenario Suffix"]
+
+
+def build_asset_names(scenario_key: str):
+    """
+    File names of the assets published for a scenario.
+    """
+    return {
+        "basic": f"{scenario_key}_simulation_basic_summary.csv",
+        "hdf": f"{scenario_key}_simulation_HDF_summary.csv",
+        "snapshot": f"{scenario_key}_simulation_snapshot.parquet",
+        "aggregates": f"{scenario_key}_simulation_aggregates.json",
+        "changes": f"{scenario_key}_simulation_changes.csv",
+    }
+
+
+def build_comparison_name(set_key: str) -> str:
+    """
+    File name of the comparison table published for a set of scenario variants.
+    """
+    return f"{set_key}_simulation_comparison.parquet"
+
+
+MANIFEST_NAME = "manifest.json"
+
+
+# =============================================================================
+# Merging
+# =============================================================================
+
+# HDF summary column(s) for each merged metric; the first one present is used
+HDF_METRIC_COLUMNS = {
+    "Max WSE (ft)": ["max_wse"],
+    "Max Depth (ft)": ["max_depth"],
+    "Max Volume (ft^3)": ["max_volume"],
+    "Max Flow Balance (ft^3/s)": ["max_flow_balance"],
+    "Max Stage BC (ft)": ["max_bc_stage", "max_bc_stage_EventCond"],
+    "Max Inflow BC (cfs)": ["max_bc_flow", "max_bc_flow_EventCond"],
+    "Max Cum PRCP (in)": ["max_prcp_EventCond"],
+}
+
+# Columns parsed from the Directory name, e.g. SS0114_PP041_SM4_BF1_Base
+STORM_ID_PATTERN = r"^(?P<stem>.*?)(?:_(?P<suffix>Base|SLR\d+))?$"
+STORM_COMPONENTS = ["SS", "PP", "SM", "BF"]
+STORM_ID_COLUMNS = ["Storm ID", *STORM_COMPONENTS, "Scenario Suffix"]
+
+
+def normalize_storm_id(names) -> pd.Index:
+    """
+    Join key for Directory / folder names: the last path component, trimmed.
+    """
+    names = pd.Series(names, dtype="string").str.strip().str.rstrip("/\\")
+    return pd.Index(names.str.rsplit("/", n=1).str[-1], name="Storm Key")
+
+
+def parse_storm_ids(directory: pd.Series) -> pd.DataFrame:
+    """
+    Split Directory names into Storm ID (name without the scenario suffix),
+    the SS / PP / SM / BF numbers as nullable integers and the scenario suffix
+    (Base, SLR1, ...). Parts missing from a name are left empty.
+    """
+    names = directory.astype("string").str.strip()
+    parts = names.str.extract(STORM_ID_PATTERN)
+    out = pd.DataFrame({"Storm ID": parts["stem"]}, index=directory.index)
+    for comp in STORM_COMPONENTS:
+        digits = names.str.extract(rf"(?:^|_){comp}(\d+)(?=_|$)", expand=False)
+        out[comp] = pd.to_numeric(digits).astype("Int16")
+    out["Scenario Suffix"] = parts["suffix"]
+    return out
+
+
+def merge_summaries(df_basic: pd.DataFrame, df_hdf: pd.DataFrame, report: dict = None) -> pd.DataFrame:
+    """
+    Merge HDF-derived metrics (indexed by 'folder') into the basic summary.
+
+    Rows are matched on the normalized storm name with a single indexed join;
+    basic rows without an HDF row get NaN metrics. When a report dict is
+    given it is filled with the unmatched and duplicated keys:
+    'basic_only', 'hdf_only' and 'hdf_duplicates'.
+    """
+    df = df_basic.copy(deep=False)
+    keys = normalize_storm_id(df["Directory"])
+
+    # One column per metric, taken from the first HDF column present
+    metrics = {}
+    for target, candidates in HDF_METRIC_COLUMNS.items():
+        source = next((c for c in candidates if c in df_hdf.columns), None)
+        if source is not None:
+            metrics[target] = df_hdf[source].to_numpy()
+    hdf_keys = normalize_storm_id(df_hdf.index)
+    hdf = pd.DataFrame(metrics, index=hdf_keys)
+
+    # Keep the last row of a storm listed twice
+    duplicated = hdf_keys.duplicated(keep="last")
+    hdf = hdf[~duplicated]
+    matched = keys.isin(hdf.index)
+
+    if report is not None:
+        report["basic_only"] = keys[~matched].tolist()
+        report["hdf_only"] = hdf.index.difference(keys).tolist()
+        report["hdf_duplicates"] = hdf_keys[duplicated].unique().tolist()
+
+    aligned = hdf.reindex(keys)
+    for target in hdf.columns:
+        df[target] = aligned[target].to_numpy()
+
+    for col, values in parse_storm_ids(df["Directory"]).items():
+        df[col] = values
+
+    # Sorting & reset for display
+    df = df.sort_values(by="Directory").reset_index(drop=True)
+    return df
+
+
+# =============================================================================
+# Schema
+# =============================================================================
+
+# Placeholders written instead of a number: 'N/A' and the asterisks Fortran
+# prints when a value overflows its field (e.g. '********'); pandas' own
+# defaults ('NA', 'nan', '', ...) apply as well
+NA_VALUES = ["N/A", "n/a", "-"] + ["*" * n for n in range(1, 33)]
+
+# dtypes of the merged summary frame; any other column is a float32 metric
+# (7 significant digits, enough for every summary value)
+SUMMARY_DTYPES = {
+    "Directory": "str",
+    "Status": "category",
+    "Failure Reason": "category",
+    "Start Time": "str",
+    "End Time": "str",
+    "Failure Info": "str",
+    "Storm ID": "str",
+    **{comp: "Int16" for comp in STORM_COMPONENTS},
+    "Scenario Suffix": "category",
+}
+METRIC_DTYPE = "float32"
+
+# pd.read_csv options of the two summary formats
+BASIC_CSV_OPTIONS = {
+    "na_values": NA_VALUES,
+    "dtype": {col: SUMMARY_DTYPES[col] for col in ["Status", "Failure Reason"]},
+}
+
+
+def _hdf_usecols(column: str) -> bool:
+    # Only the storm name and the columns merged into the summary are parsed
+    return column == "folder" or any(column in candidates for candidates in HDF_METRIC_COLUMNS.values())
+
+
+HDF_CSV_OPTIONS = {
+    "index_col": "folder",
+    "usecols": _hdf_usecols,
+    "na_values": NA_VALUES,
+}
+
+
+def summary_dtype(column: str) -> str:
+    return SUMMARY_DTYPES.get(column, METRIC_DTYPE)
+
+
+# =============================================================================
+# Status classification and status table
+# =============================================================================
+
+STATUS_CLASSES = ["Success", "Running", "Failed", "Other"]
+
+# Row background per status class in the status table
+STATUS_CLASS_STYLES = {
+    "Success": "background-color: lightgreen",
+    "Running": "background-color: lightblue",
+    "Failed": "background-color: lightcoral",
+    "Other": "",
+}
+
+# Columns searched by the status table filter
+STATUS_TABLE_SEARCH_COLUMNS = ["Directory", "Status", "Failure Reason"]
+
+
+def _status_class_codes(values: pd.Series) -> np.ndarray:
+    # Position in STATUS_CLASSES of each raw Status value
+    values = values.astype(str).str.strip().str.lower()
+    return np.select(
+        [values == "success", values == "running", values.str.contains("failed", regex=False)],
+        [0, 1, 2],
+        default=STATUS_CLASSES.index("Other"),
+    )
+
+
+def classify_status(status: pd.Series) -> pd.Series:
+    """
+    Map raw Status values to Success / Running / Failed / Other as a categorical.
+    A categorical Status is classified once per category instead of per row.
+    """
+    if isinstance(status.dtype, pd.CategoricalDtype):
+        # Missing values (code -1) pick the appended 'Other'
+        lookup = np.append(_status_class_codes(pd.Series(status.cat.categories)), STATUS_CLASSES.index("Other"))
+        codes = lookup[status.cat.codes.to_numpy()]
+    else:
+        codes = _status_class_codes(status)
+    classes = pd.Categorical.from_codes(codes, categories=STATUS_CLASSES)
+    return pd.Series(classes, index=status.index, name="Status Class")
+
+
+def query_status_table(df: pd.DataFrame, search: str = "", sort_by: str = None, ascending: bool = True):
+    """
+    Filter the status table by a case-insensitive search across
+    STATUS_TABLE_SEARCH_COLUMNS and sort it; pages are then sliced with .iloc.
+    """
+    if search:
+        mask = np.zeros(len(df), dtype=bool)
+        for col in STATUS_TABLE_SEARCH_COLUMNS:
+            if col in df.columns:
+                mask |= df[col].astype(str).str.contains(search, case=False, regex=False).to_numpy()
+        df = df[mask]
+
+    if sort_by in df.columns:
+        df = df.sort_values(by=sort_by, ascending=ascending, kind="stable")
+    return df
+
+
+def style_status_table(df: pd.DataFrame):
+    """
+    Color rows by status class (vectorized; meant for a single page of the table).
+    """
+    row_styles = classify_status(df["Status"]).astype(str).map(STATUS_CLASS_STYLES).to_numpy()
+
+    def _styles(frame):
+        return pd.DataFrame(np.repeat(row_styles[:, None], frame.shape[1], axis=1),
+                            index=frame.index, columns=frame.columns)
+
+    return df.style.apply(_styles, axis=None)
+
+
+# =============================================================================
+# Facet filters
+# =============================================================================
+
+# Columns the dashboard can be filtered by; storm-ID numbers are shown zero-padded
+FACET_COLUMNS = ["Status Class", "SM", "BF", "SS", "PP"]
+FACET_LABEL_WIDTHS = {"SS": 4, "PP": 3}
+
+
+def facet_label(facet: str, value) -> str:
+    """
+    Display label of a facet value, e.g. SS0114 or PP041 as in the Directory names.
+    """
+    if facet in STORM_COMPONENTS:
+        return f"{facet}{int(value):0{FACET_LABEL_WIDTHS.get(facet, 1)}d}"
+    return str(value)
+
+
+def build_facet_index(df: pd.DataFrame) -> dict:
+    """
+    One packed row bitmap per facet value, built once per data version.
+
+    Returns {"rows": n, "facets": {facet: {value: bitmap}}} where each bitmap is
+    np.packbits of the rows holding the value. Rows with a missing value are in
+    no bitmap, and facets absent from the frame or without values are left out.
+    """
+    index = {"rows": len(df), "facets": {}}
+    for facet in FACET_COLUMNS:
+        if facet == "Status Class" and facet not in df.columns and "Status" in df.columns:
+            values = classify_status(df["Status"])
+        elif facet in df.columns:
+            values = df[facet]
+        else:
+            continue
+
+        codes, uniques = pd.factorize(values, sort=True)
+        if len(uniques) == 0:
+            continue
+        index["facets"][facet] = {
+            (uniques[i].item() if hasattr(uniques[i], "item") else uniques[i]): np.packbits(codes == i)
+            for i in range(len(uniques))
+        }
+    return index
+
+
+def _selection_bitmap(index: dict, selections: dict, skip: str = None):
+    """
+    AND over facets of the OR over the selected values; None when nothing is selected.
+    """
+    bitmap = None
+    for facet, values in selections.items():
+        bitmaps = index["facets"].get(facet)
+        if facet == skip or not values or bitmaps is None:
+            continue
+        facet_bits = np.zeros((index["rows"] + 7) // 8, dtype=np.uint8)
+        for value in values:
+            if value in bitmaps:
+                facet_bits |= bitmaps[value]
+        bitmap = facet_bits if bitmap is None else bitmap & facet_bits
+    return bitmap
+
+
+def filter_mask(index: dict, selections: dict) -> np.ndarray:
+    """
+    Boolean row mask for {facet: selected values}; empty selections match every row.
+    """
+    bitmap = _selection_bitmap(index, selections)
+    if bitmap is None:
+        return np.ones(index["rows"], dtype=bool)
+    return np.unpackbits(bitmap, count=index["rows"]).astype(bool)
+
+
+def facet_counts(index: dict, selections: dict) -> dict:
+    """
+    Rows per facet value under the selections on the other facets, so each
+    option shows how many storms it would add.
+    """
+    counts = {}
+    for facet, bitmaps in index["facets"].items():
+        others = _selection_bitmap(index, selections, skip=facet)
+        counts[facet] = {
+            value: int(np.bitwise_count(bits if others is None else bits & others).sum())
+            for value, bits in bitmaps.items()
+        }
+    return counts
+
+
+# =============================================================================
+# Aggregates
+# =============================================================================
+
+# Metrics with a p95 threshold in the aggregates
+P95_COLUMNS = [
+    "SUs", "Max WSEL Err", "Vol Error (AF)", "Vol Error (%)",
+    "Max Depth (ft)", "Max Volume (ft^3)", "Max Flow Balance (ft^3/s)",
+    "Max Stage BC (ft)", "Max Inflow BC (cfs)", "Max Cum PRCP (in)",
+]
+
+# Metrics of successful runs in the correlation matrix
+CORRELATION_COLUMNS = [
+    "Vol Error (%)", "Vol Error (AF)", "Max Depth (ft)", "Max Volume (ft^3)",
+    "Max Flow Balance (ft^3/s)", "Max Stage BC (ft)", "Max Inflow BC (cfs)", "Max Cum PRCP (in)",
+]
+
+
+def _float_or_none(value):
+    # JSON has no NaN
+    return None if pd.isna(value) else float(value)
+
+
+def compute_aggregates(df: pd.DataFrame) -> dict:
+    """
+    Everything the overview needs, computed once per data version.
+    """
+    status = df["Status"].astype(str)
+    is_success = (status == "SUCCESS").to_numpy()
+    is_failed = status.str.contains("failed", case=False, regex=False).to_numpy()
+    is_running = (status == "Running").to_numpy()
+
+    # Sums, quantiles and correlations in float64
+    numeric = to_typed_frame(df[[c for c in dict.fromkeys(P95_COLUMNS + CORRELATION_COLUMNS) if c in df.columns]])
+    numeric = numeric.astype("float64")
+
+    corr_columns = [c for c in CORRELATION_COLUMNS if c in numeric.columns]
+    corr = numeric.loc[is_success, corr_columns].corr()
+
+    if "Failure Reason" in df.columns:
+        reasons = df.loc[is_failed, "Failure Reason"].astype("string").fillna("Unknown").value_counts()
+    else:
+        reasons = pd.Series(dtype="int64")
+
+    return {
+        "rows": int(len(df)),
+        "success": int(is_success.sum()),
+        "failed": int(is_failed.sum()),
+        "running": int(is_running.sum()),
+        "not_running": int((~is_running).sum()),
+        # List of [status, count] pairs, most frequent first
+        "status_counts": [[str(k), int(v)] for k, v in status.value_counts().items()],
+        # List of [failure reason, count] pairs of the failed runs, most frequent first
+        "failure_reasons": [[str(k), int(v)] for k, v in reasons.items()],
+        "total_sus": _float_or_none(numeric.loc[is_success, "SUs"].sum()) if "SUs" in numeric.columns else None,
+        "p95": {c: _float_or_none(numeric[c].quantile(0.95)) for c in P95_COLUMNS if c in numeric.columns},
+        "correlation": {
+            "columns": corr_columns,
+            "values": [[_float_or_none(v) for v in row] for row in corr.to_numpy()],
+        },
+    }
+
+
+def summarize_aggregates(aggregates: dict, total_simulations: int = None) -> dict:
+    """
+    Progress, SU total and failure rate of one scenario from its aggregates.
+    """
+    total = total_simulations or aggregates["rows"]
+    completed = aggregates["not_running"]
+    finished = aggregates["success"] + aggregates["failed"]
+    return {
+        "completed": completed,
+        "running": aggregates["running"],
+        "failed": aggregates["failed"],
+        "waiting": max(0, total - (finished + aggregates["running"])),
+        "total": total,
+        "progress_pct": min(100.0, 100.0 * completed / total) if total else 0.0,
+        "total_sus": aggregates["total_sus"] or 0.0,
+        "failure_rate_pct": 100.0 * aggregates["failed"] / finished if finished else 0.0,
+    }
+
+
+def write_aggregates(aggregates: dict, path):
+    with open(path, "w") as f:
+        json.dump(aggregates, f, indent=1)
+
+
+# =============================================================================
+# Scenario comparison
+# =============================================================================
+
+# Metrics compared storm by storm between the variants of a scenario set
+COMPARISON_METRICS = ["Max Depth (ft)", "Max Stage BC (ft)", "Vol Error (AF)"]
+
+# Status class of a storm that a variant has not (yet) listed
+MISSING_CLASS = "Missing"
+COMPARISON_CLASSES = [*STATUS_CLASSES, MISSING_CLASS]
+
+
+def variant_column(column: str, variant: str) -> str:
+    return f"{column} [{variant}]"
+
+
+def delta_column(metric: str, variant: str, baseline: str) -> str:
+    return f"Δ {metric} [{variant} - {baseline}]"
+
+
+def transition_column(variant: str, baseline: str) -> str:
+    return f"Status Class [{baseline} → {variant}]"
+
+
+def build_comparison(frames: dict, metrics=COMPARISON_METRICS) -> pd.DataFrame:
+    """
+    Storm-aligned wide table of scenario variants that ran the same storms.
+
+    frames maps variant labels (Base, SLR1, ...) to merged frames, the first
+    one being the baseline. Rows are joined on Storm ID (the Directory name
+    without its scenario suffix), keeping storms missing from some variants.
+    Each variant contributes its Status, Status Class and metrics; every
+    other variant also its metric deltas to the baseline and its status class
+    transition from it ('Success → Failed', 'Running → Missing', ...).
+    """
+    variants = list(frames)
+    baseline = variants[0]
+    indexed = {
+        variant: df.drop_duplicates("Storm ID", keep="last").set_index("Storm ID")
+        for variant, df in frames.items()
+    }
+    storm_ids = indexed[baseline].index
+    for variant in variants[1:]:
+        storm_ids = storm_ids.union(indexed[variant].index)
+    storm_ids = storm_ids.dropna().sort_values()
+
+    aligned = {variant: df.reindex(storm_ids) for variant, df in indexed.items()}
+
+    # Storm parameters from whichever variant lists the storm
+    components = [c for c in STORM_COMPONENTS if c in indexed[baseline].columns]
+    params = aligned[baseline][components]
+    for variant in variants[1:]:
+        params = params.combine_first(aligned[variant][components])
+
+    columns = {"Storm ID": storm_ids.to_numpy(), **{c: params[c].array for c in components}}
+    class_codes = {}
+    for variant in variants:
+        present = indexed[variant].index.get_indexer(storm_ids) >= 0
+        columns[variant_column("Status", variant)] = pd.Categorical(aligned[variant]["Status"])
+        codes = np.where(present, classify_status(aligned[variant]["Status"]).cat.codes.to_numpy(),
+                         COMPARISON_CLASSES.index(MISSING_CLASS))
+        class_codes[variant] = codes
+        columns[variant_column("Status Class", variant)] = pd.Categorical.from_codes(codes, COMPARISON_CLASSES)
+        for metric in metrics:
+            frame = aligned[variant]
+            values = frame[metric] if metric in frame.columns else pd.Series(np.nan, index=storm_ids)
+            columns[variant_column(metric, variant)] = pd.to_numeric(values).to_numpy(METRIC_DTYPE)
+
+    n_classes = len(COMPARISON_CLASSES)
+    transitions = [f"{a} → {b}" for a in COMPARISON_CLASSES for b in COMPARISON_CLASSES]
+    for variant in variants[1:]:
+        for metric in metrics:
+            columns[delta_column(metric, variant, baseline)] = (
+                columns[variant_column(metric, variant)] - columns[variant_column(metric, baseline)]
+            )
+        codes = class_codes[baseline] * n_classes + class_codes[variant]
+        columns[transition_column(variant, baseline)] = (
+            pd.Categorical.from_codes(codes, transitions).remove_unused_categories()
+        )
+    return pd.DataFrame(columns)
+
+
+def write_comparison(df: pd.DataFrame, path):
+    """
+    Write a comparison table as compressed Parquet (its columns are typed by build_comparison).
+    """
+    df.to_parquet(path, index=False, compression="zstd")
+
+
+def comparison_variants(df: pd.DataFrame) -> list:
+    """
+    Variant labels of a comparison table, the baseline first.
+    """
+    prefix = "Status Class ["
+    return [c[len(prefix):-1] for c in df.columns if c.startswith(prefix) and "→" not in c]
+
+
+# =============================================================================
+# Timeline
+# =============================================================================
+
+# Start Time / End Time are written without a year, e.g. 'Dec 30 16:28' or 'Jan  1 12:50'
+RUN_TIME_FORMAT = "%Y %b %d %H:%M"
+
+# Calendar used to place year-less timestamps (a leap year, so Feb 29 parses)
+_CALENDAR_YEAR = 2000
+_CALENDAR_LENGTH = pd.Timedelta(days=366)
+
+
+def _parse_calendar_times(values: pd.Series) -> pd.Series:
+    """
+    Year-less timestamps placed in _CALENDAR_YEAR; NaT when missing or unparsable.
+    """
+    text = values.astype("string").str.replace(r"\s+", " ", regex=True).str.strip()
+    return pd.to_datetime(f"{_CALENDAR_YEAR} " + text, format=RUN_TIME_FORMAT, errors="coerce")
+
+
+def _with_years(calendar_times: pd.Series, years) -> pd.Series:
+    """
+    Move calendar times to the given years (vectorized; Feb 29 of a non-leap year is NaT).
+    """
+    return pd.to_datetime(pd.DataFrame({
+        "year": years,
+        "month": calendar_times.dt.month,
+        "day": calendar_times.dt.day,
+        "hour": calendar_times.dt.hour,
+        "minute": calendar_times.dt.minute,
+    }, index=calendar_times.index), errors="coerce")
+
+
+def parse_run_times(start: pd.Series, end: pd.Series, reference=None):
+    """
+    Start/End Time strings without a year to datetimes; returns (start, end).
+
+    The runs of a scenario span less than a year, so the largest gap between
+    the calendar days of all timestamps marks where the scenario started:
+    timestamps earlier in the calendar than that point belong to the next year
+    (Dec -> Jan rollover). The first year is the one that puts the scenario
+    start closest to reference (e.g. the configured start date), or without a
+    reference the latest one that puts no timestamp in the future. An End
+    before its Start is moved one year forward. Missing values are NaT.
+    """
+    start_cal = _parse_calendar_times(start)
+    end_cal = _parse_calendar_times(end)
+    base = pd.Timestamp(f"{_CALENDAR_YEAR}-01-01")
+
+    offsets = np.unique(pd.concat([start_cal, end_cal]).dropna().to_numpy() - base.to_datetime64())
+    if len(offsets) == 0:
+        return start_cal, end_cal
+
+    # Largest circular gap: the scenario starts right after it
+    gaps = np.append(np.diff(offsets), offsets[0] + _CALENDAR_LENGTH.to_timedelta64() - offsets[-1])
+    largest = int(np.argmax(gaps))
+    first = base + pd.Timedelta(offsets[(largest + 1) % len(offsets)])
+    last = base + pd.Timedelta(offsets[largest])
+    wraps = last < first
+
+    def _at(calendar_time, year):
+        return _with_years(pd.Series([calendar_time]), [year]).iloc[0]
+
+    if reference is not None:
+        reference = pd.Timestamp(reference)
+        candidates = [reference.year - 1, reference.year, reference.year + 1]
+        year = min(candidates, key=lambda y: abs(_at(first, y) - reference) if _at(first, y) is not pd.NaT
+                   else pd.Timedelta.max)
+    else:
+        now = pd.Timestamp.now()
+        year = now.year - int(wraps)
+        if _at(last, year + int(wraps)) > now:
+            year -= 1
+
+    def _place(calendar_times):
+        years = np.where(calendar_times < first, year + 1, year)
+        return _with_years(calendar_times, years)
+
+    start_dt = _place(start_cal)
+    end_dt = _place(end_cal)
+    rolled = end_dt < start_dt
+    if rolled.any():
+        end_dt[rolled] = _with_years(end_cal[rolled], end_dt[rolled].dt.year + 1)
+    return start_dt, end_dt
+
+
+def running_jobs(start: pd.Series, end: pd.Series) -> pd.Series:
+    """
+    Number of running jobs after each start (+1) and end (-1), as a step series
+    indexed by time. Runs without an End are still running.
+    """
+    started = start.notna().to_numpy()
+    ends = end[started]
+    ends = ends[ends.notna()]
+    times = np.concatenate([start[started].to_numpy(), ends.to_numpy()])
+    steps = np.concatenate([np.ones(int(started.sum()), dtype=np.int64), -np.ones(len(ends), dtype=np.int64)])
+
+    # Ends before starts at the same minute, so back-to-back jobs do not overlap
+    order = np.lexsort((steps, times))
+    return pd.Series(np.cumsum(steps[order]), index=pd.DatetimeIndex(times[order]), name="Running Jobs")
+
+
+def run_throughput(end: pd.Series, sus: pd.Series, freq: str = "1h", window: str = "24h") -> pd.DataFrame:
+    """
+    Completions and SUs per freq interval (by End time), plus the rolling SU
+    burn rate in SU/h and completion rate in runs/h over window.
+    """
+    finished = end.notna().to_numpy()
+    done = pd.DataFrame(
+        {"Completions": 1, "SUs": pd.to_numeric(sus, errors="coerce").to_numpy()[finished]},
+        index=pd.DatetimeIndex(end[finished].to_numpy()),
+    ).sort_index()
+    per_interval = done.resample(freq).sum()
+
+    window_hours = pd.Timedelta(window) / pd.Timedelta(hours=1)
+    per_interval["Completions per Hour"] = per_interval["Completions"].rolling(window).sum() / window_hours
+    per_interval["SU Burn (SU/h)"] = per_interval["SUs"].rolling(window).sum() / window_hours
+    return per_interval
+
+
+def project_completion(end: pd.Series, remaining: int, window: str = "24h") -> dict:
+    """
+    Completion ETA from the number of runs finished in the window before the
+    last completion. 'eta' is None while nothing finished in that window.
+    """
+    end = end.dropna()
+    if end.empty:
+        return {"rate_per_hour": 0.0, "remaining": remaining, "eta": None}
+
+    last = end.max()
+    window = pd.Timedelta(window)
+    rate = float((end > last - window).sum()) / (window / pd.Timedelta(hours=1))
+    if remaining <= 0:
+        eta = last
+    elif rate > 0:
+        eta = last + pd.Timedelta(hours=remaining / rate)
+    else:
+        eta = None
+    return {"rate_per_hour": rate, "remaining": remaining, "eta": eta}
+
+
+def compute_timeline(df: pd.DataFrame, total_simulations: int = None, reference=None,
+                     freq: str = "1h", window: str = "24h") -> dict:
+    """
+    Running jobs over time, throughput, SU burn and the projected completion of a scenario.
+
+    'running' has one value per start/end event; 'running_per_interval' is its
+    maximum per freq interval, for plotting.
+    """
+    start, end = parse_run_times(df["Start Time"], df["End Time"], reference)
+    total = total_simulations or len(df)
+    projection = project_completion(end, max(0, total - int(end.notna().sum())), window)
+    running = running_jobs(start, end)
+    return {
+        "running": running,
+        "running_per_interval": running.resample(freq).max().ffill(),
+        "throughput": run_throughput(end, df["SUs"], freq, window),
+        "peak_running": int(running.max()) if len(running) else 0,
+        "first_start": start.min(),
+        "last_end": end.max(),
+        **projection,
+    }
+
+
+# =============================================================================
+# Columnar snapshots
+# =============================================================================
+
+def to_typed_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cast every column to its SUMMARY_DTYPES dtype; metrics become float32 with
+    anything that is not a number as NaN. Columns that already have their
+    dtype are shared with df, so typing a typed frame costs nothing.
+    """
+    columns = {}
+    for col in df.columns:
+        dtype = summary_dtype(col)
+        values = df[col]
+        if values.dtype == dtype:
+            continue
+        if dtype in (METRIC_DTYPE, "Int16"):
+            values = pd.to_numeric(values, errors="coerce")
+        columns[col] = values.astype(dtype)
+    return df.assign(**columns)
+
+
+def write_snapshot(df: pd.DataFrame, path: str):
+    """
+    Write a merged scenario frame as a compressed Parquet snapshot.
+    """
+    to_typed_frame(df).to_parquet(path, index=False, compression="zstd")
+
+
+def read_snapshot(path_or_url: str, content_hash: str = None) -> pd.DataFrame:
+    """
+    Read a scenario snapshot from a local path or an http(s) URL.
+    """
+    return read_cached(path_or_url, pd.read_parquet, content_hash=content_hash)
+
+
+# =============================================================================
+# Change log
+# =============================================================================
+#
+# '<scenario>_simulation_changes.csv' is append-only: every publish appends the
+# rows that are new or differ from the previous snapshot, stamped with the new
+# data version in '_version'. The manifest entry of the change log records the
+# byte offset at which each version starts, so a client holding version v only
+# reads the bytes of versions > v.
+
+VERSION_COLUMN = "_version"
+
+
+def diff_snapshots(df_old: pd.DataFrame, df_new: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rows of df_new (typed frames keyed by Directory) that are new or changed.
+    """
+    if df_old is None or list(df_old.columns) != list(df_new.columns):
+        return df_new
+
+    old_hash = pd.util.hash_pandas_object(df_old.set_index("Directory"), index=True)
+    new_hash = pd.util.hash_pandas_object(df_new.set_index("Directory"), index=True)
+    changed = ~new_hash.isin(old_hash).to_numpy()
+    return df_new[changed]
+
+
+def append_changes(path, changes: pd.DataFrame, version: int) -> int:
+    """
+    Append rows stamped with version to the change log (created with a header).
+
+    Returns the byte offset at which the appended rows start.
+    """
+    changes = changes.assign(**{VERSION_COLUMN: version})
+    if not os.path.exists(path):
+        changes.iloc[:0].to_csv(path, index=False)
+    offset = os.path.getsize(path)
+    changes.to_csv(path, mode="a", header=False, index=False)
+    return offset
+
+
+def read_changes(path_or_url: str, offset: int, columns: list, max_version: int) -> pd.DataFrame:
+    """
+    Parse the change log from a byte offset, keeping versions up to max_version.
+    """
+    body = fetch_range(path_or_url, offset)
+    if not body.strip():
+        return pd.DataFrame(columns=columns + [VERSION_COLUMN])
+
+    changes = pd.read_csv(io.BytesIO(body), header=None, names=columns + [VERSION_COLUMN])
+    changes = changes[changes[VERSION_COLUMN] <= max_version]
+    return to_typed_frame(changes.drop(columns=VERSION_COLUMN))
+
+
+def apply_changes(df: pd.DataFrame, changes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Upsert changed rows into a frame indexed by Directory and return the result.
+
+    The input is left untouched: the result is a shallow copy in which only the
+    columns whose values changed are copied and rewritten at the changed positions
+    (looked up through the index's cached hash table), so updates cost grows with
+    the changed rows rather than the scenario. New storms are appended with a concat.
+    """
+    changes = changes.set_index(changes["Directory"])
+    changes = changes[~changes.index.duplicated(keep="last")]
+
+    df = df.copy(deep=False)
+    positions = df.index.get_indexer(changes.index)
+    existing = positions >= 0
+    rows = positions[existing]
+    updated = changes[existing]
+
+    for col in updated.columns.intersection(df.columns):
+        old = df[col].iloc[rows].reset_index(drop=True)
+        new = updated[col].reset_index(drop=True)
+        if old.astype(object).equals(new.astype(object)):
+            continue
+        values = df[col].array.copy()
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Statuses / failure reasons first seen in the changes become categories
+            missing = pd.Index(new.dropna().unique()).difference(values.categories)
+            if len(missing):
+                values = values.add_categories(missing)
+            new = new.astype(object)
+        values[rows] = new.to_numpy()
+        df[col] = values
+
+    if (~existing).any():
+        added = changes[~existing]
+        for col in added.columns.intersection(df.columns):
+            if isinstance(df[col].dtype, pd.CategoricalDtype) and isinstance(added[col].dtype, pd.CategoricalDtype):
+                categories = df[col].cat.categories.union(added[col].cat.categories)
+                df[col] = df[col].cat.set_categories(categories)
+                added[col] = added[col].cat.set_categories(categories)
+        df = pd.concat([df, added]).sort_index()
+    return df
+
+
+# =============================================================================
+# Manifest
+# =============================================================================
+
+def build_manifest_entry(path, scenario_key: str, kind: str, df: pd.DataFrame = None):
+    """
+    Manifest record for one published file: timestamp, row count, status counts and hash.
+    """
+    with open(path, "rb") as f:
+        sha256 = hashlib.sha256(f.read()).hexdigest()
+    updated = datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.utc)
+
+    entry = {
+        "scenario": scenario_key,
+        "kind": kind,
+        "updated": updated.isoformat(),
+        "sha256": sha256,
+    }
+    if df is None:
+        return entry
+
+    entry["rows"] = int(len(df))
+    if "Status" in df.columns:
+        entry["status_counts"] = {str(k): int(v) for k, v in df["Status"].value_counts().items() if v}
+    return entry
+
+
+def write_manifest(path, files: dict):
+    """
+    Write the manifest listing every published file (keyed by file name).
+    """
+    manifest = {
+        "generated": datetime.now(timezone.utc).isoformat(),
+        "files": files,
+    }
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+
+def _load_json(path_or_buffer) -> dict:
+    if hasattr(path_or_buffer, "read"):
+        return json.load(path_or_buffer)
+    with open(path_or_buffer, "r") as f:
+        return json.load(f)
+
+
+def read_json(path_or_url: str, content_hash: str = None) -> dict:
+    """
+    Read a published JSON file (manifest, aggregates) from a local path or an http(s) URL.
+    """
+    return read_cached(path_or_url, _load_json, content_hash=content_hash)
+
+
+def read_manifest(path_or_url: str) -> dict:
+    return read_json(path_or_url)
+
+
+def manifest_entry(manifest: dict, file_name: str) -> dict:
+    """
+    Entry for a file name, or an empty dict if the manifest does not list it.
+    """
+    if not manifest:
+        return {}
+    return manifest.get("files", {}).get(file_name, {})
+
+
+def manifest_updated_dt(manifest: dict, file_name: str):
+    """
+    Timestamp of a file from the manifest as an aware UTC datetime, or None.
+    """
+    updated = manifest_entry(manifest, file_name).get("updated")
+    if not updated:
+        return None
+    return datetime.fromisoformat(updated).astimezone(timezone.utc)
+
+
+# =============================================================================
+# Persistent HTTP cache
+# =============================================================================
+
+# Bodies survive restarts and are shared by every process pointing at the same folder
+CACHE_DIR = os.environ.get("COJ_CACHE_DIR", os.path.join(tempfile.gettempdir(), "coj_dashboard_cache"))
+
+# Parsed frames keyed by (url, reader, kwargs) -> (content hash, frame)
+_parsed_frames = {}
+_parsed_frames_lock = threading.Lock()
+
+# URLs that answered 404 -> time of the answer; not requested again for CACHE_TTL seconds
+CACHE_TTL = 60
+_missing_urls = {}
+
+
+def is_url(path: str) -> bool:
+    return str(path).startswith(("http://", "https://"))
+
+
+def _cache_paths(url: str, cache_dir: str):
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"{key}.body"), os.path.join(cache_dir, f"{key}.json")
+
+
+def fetch_cached(url: str, cache_dir: str = None, timeout: float = 30):
+    """
+    Fetch a URL through the on-disk cache.
+
+    The stored ETag / Last-Modified are sent as If-None-Match / If-Modified-Since,
+    and a 304 answer is served from disk. If the server cannot be reached the
+    cached body is returned as is.
+
+    Returns (body, content_hash, modified) where modified is False for a 304.
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    if time.time() - _missing_urls.get(url, -CACHE_TTL) < CACHE_TTL:
+        diag.count("http", "known_missing")
+        raise FileNotFoundError(url)
+    os.makedirs(cache_dir, exist_ok=True)
+    body_path, meta_path = _cache_paths(url, cache_dir)
+
+    meta = None
+    if os.path.exists(body_path) and os.path.exists(meta_path):
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = None
+
+    headers = {}
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        with diag.span("fetch", url=url.rsplit("/", 1)[-1]):
+            r = requests.get(url, headers=headers, timeout=timeout)
+    except requests.RequestException:
+        if meta is None:
+            raise
+        r = None
+
+    if r is None or r.status_code == 304:
+        diag.count("http", "offline" if r is None else "not_modified")
+        with open(body_path, "rb") as f:
+            return f.read(), meta["sha256"], False
+
+    diag.count("http", f"status_{r.status_code}")
+    if r.status_code == 404:
+        _missing_urls[url] = time.time()
+        raise FileNotFoundError(url)
+    r.raise_for_status()
+    body = r.content
+    meta = {
+        "url": url,
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+        "sha256": hashlib.sha256(body).hexdigest(),
+    }
+
+    # Write to a private temp file first so concurrent readers never see partial bodies
+    for path, data, mode in ((body_path, body, "wb"), (meta_path, json.dumps(meta), "w")):
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+        with os.fdopen(fd, mode) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    return body, meta["sha256"], True
+
+
+def fetch_range(path_or_url: str, offset: int, timeout: float = 30) -> bytes:
+    """
+    Bytes of a local file or URL from offset to the end (HTTP Range request).
+    """
+    if not is_url(path_or_url):
+        with open(path_or_url, "rb") as f:
+            f.seek(offset)
+            return f.read()
+
+    r = requests.get(path_or_url, headers={"Range": f"bytes={offset}-"}, timeout=timeout)
+    if r.status_code == 416:
+        return b""
+    r.raise_for_status()
+    # Servers that ignore Range answer 200 with the whole body
+    return r.content if r.status_code == 206 else r.content[offset:]
+
+
+def read_cached(path_or_url: str, reader, content_hash: str = None, **kwargs) -> pd.DataFrame:
+    """
+    Parse a local file or URL with a pandas reader (pd.read_csv, pd.read_parquet, ...).
+
+    URLs go through fetch_cached; when the body is unchanged the frame parsed
+    on a previous call is reused instead of parsing it again. If the expected
+    content_hash is known (from the manifest) and matches, no request is made.
+    """
+    file_name = str(path_or_url).rsplit("/", 1)[-1]
+    if not is_url(path_or_url):
+        with diag.span(f"read {file_name}"):
+            return reader(path_or_url, **kwargs)
+
+    # Options such as na_values are lists, so they are keyed by their repr
+    key = (path_or_url, reader.__name__, repr(sorted(kwargs.items())))
+    if content_hash is not None:
+        with _parsed_frames_lock:
+            cached = _parsed_frames.get(key)
+        if cached is not None and cached[0] == content_hash:
+            diag.count("parsed_frames", "hit")
+            return cached[1].copy()
+
+    body, content_hash, _ = fetch_cached(path_or_url)
+
+    with _parsed_frames_lock:
+        cached = _parsed_frames.get(key)
+    if cached is not None and cached[0] == content_hash:
+        diag.count("parsed_frames", "hit")
+        return cached[1].copy()
+
+    diag.count("parsed_frames", "miss")
+    with diag.span(f"parse {file_name}"):
+        df = reader(io.BytesIO(body), **kwargs)
+    with _parsed_frames_lock:
+        _parsed_frames[key] = (content_hash, df)
+    return df.copy()
+
+
+# =============================================================================
+# Local asset watching
+# =============================================================================
+
+# watchdog event types that mean a file changed
+WRITE_EVENTS = {"created", "modified", "moved", "deleted", "closed"}
+
+# Watchers by absolute folder; the data version of a watched scenario is its change count
+_watchers = {}
+_watchers_lock = threading.Lock()
+
+
+def scenario_for_file(file_name: str):
+    """
+    Scenario key of an asset file name ('<scenario>_simulation_...'), None otherwise.
+    """
+    stem, sep, _ = file_name.rpartition("_simulation_")
+    return stem if sep else None
+
+
+class AssetWatcher:
+    """
+    Counts changes to the files of a local assets folder, per scenario.
+
+    Uses watchdog (inotify on Linux) when it is installed and polling=False,
+    otherwise a thread comparing file times and sizes every poll_interval
+    seconds. Shared cluster file systems do not always deliver inotify
+    events for writes made on other nodes; use polling there.
+    """
+
+    def __init__(self, root_dir: str, polling: bool = False, poll_interval: float = 1.0):
+        self.root_dir = os.path.abspath(root_dir)
+        self.polling = polling
+        self.poll_interval = poll_interval
+        self.generation = 0
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._observer = None
+
+    def version(self, scenario_key: str = None) -> int:
+        """
+        Number of changes seen for a scenario; None counts the manifest.
+        """
+        with self._lock:
+            return self._versions.get(scenario_key, 0)
+
+    def touch(self, path: str):
+        name = os.path.basename(path)
+        if name.startswith(".") or name.endswith(".tmp"):
+            return
+        scenario_key = scenario_for_file(name)
+        if scenario_key is None and name != MANIFEST_NAME:
+            return
+        with self._lock:
+            self._versions[scenario_key] = self._versions.get(scenario_key, 0) + 1
+            self.generation += 1
+
+    def _scan(self) -> dict:
+        files = {}
+        with os.scandir(self.root_dir) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def _poll(self):
+        previous = self._scan()
+        while not self._stop.wait(self.poll_interval):
+            try:
+                current = self._scan()
+            except OSError:
+                continue
+            for path in previous.keys() | current.keys():
+                if previous.get(path) != current.get(path):
+                    self.touch(path)
+            previous = current
+
+    def start(self):
+        if not self.polling:
+            try:
+                from watchdog.events import FileSystemEventHandler
+                from watchdog.observers import Observer
+            except ImportError:
+                self.polling = True
+
+        if self.polling:
+            threading.Thread(target=self._poll, name="asset-watcher", daemon=True).start()
+            return self
+
+        watcher = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                # Reads raise 'opened' / 'closed_no_write' events; only writes count
+                if event.is_directory or event.event_type not in WRITE_EVENTS:
+                    return
+                watcher.touch(event.src_path)
+                if getattr(event, "dest_path", ""):
+                    watcher.touch(event.dest_path)
+
+        self._observer = Observer()
+        self._observer.daemon = True
+        self._observer.schedule(_Handler(), self.root_dir, recursive=False)
+        self._observer.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+
+
+def watch_assets(root_dir: str, polling: bool = False, poll_interval: float = 1.0) -> AssetWatcher:
+    """
+    Start (once per folder and process) watching a local assets folder.
+
+    While a folder is watched, data loaded from it is memoized per scenario
+    change count instead of for CACHE_TTL seconds, so a change only reloads
+    the files of its own scenario and an idle dashboard reads nothing.
+    """
+    root_dir = os.path.abspath(root_dir)
+    with _watchers_lock:
+        watcher = _watchers.get(root_dir)
+        if watcher is None:
+            watcher = _watchers[root_dir] = AssetWatcher(root_dir, polling, poll_interval).start()
+    return watcher
+
+
+def get_watcher(root_dir: str):
+    """
+    Watcher of a local folder started by watch_assets, or None.
+    """
+    if is_url(root_dir):
+        return None
+    with _watchers_lock:
+        return _watchers.get(os.path.abspath(root_dir))
+
+
+# =============================================================================
+# Scenario loading
+# =============================================================================
+
+# Aggregates (published or computed from row-level data), keyed by (root_dir, scenario_key, data version)
+_computed_aggregates = {}
+_computed_aggregates_lock = threading.Lock()
+
+# Merged frames of scenarios without a change log, keyed the same way
+_merged_frames = {}
+_merged_frames_lock = threading.Lock()
+
+# Row-level frames with their facet index, keyed the same way
+_faceted_frames = {}
+_faceted_frames_lock = threading.Lock()
+
+
+def scenario_data_version(root_dir: str, scenario_key: str, manifest: dict = None):
+    """
+    Change counts of a watched local scenario, else the content hashes of its
+    published files; None when neither is available.
+    """
+    watcher = get_watcher(root_dir)
+    if watcher is not None:
+        return f"watched:{watcher.version(scenario_key)}:{watcher.version(None)}"
+    if manifest is None:
+        return None
+    names = build_asset_names(scenario_key)
+    kinds = ("basic", "hdf", "snapshot", "aggregates")
+    return "|".join(str(manifest_entry(manifest, names[kind]).get("sha256")) for kind in kinds)
+
+
+def _memoize_by_version(cache: dict, lock, root_dir: str, scenario_key: str, manifest: dict, build,
+                        name: str = "scenario", data_version=None):
+    """
+    Value of build() memoized per data version, or for CACHE_TTL seconds without one.
+    Older versions of the same scenario are dropped; lookups are counted under name.
+    The version is that of the scenario unless one is given.
+    """
+    if data_version is None:
+        data_version = scenario_data_version(root_dir, scenario_key, manifest)
+    key = (root_dir, scenario_key, data_version)
+
+    with lock:
+        cached = cache.get(key)
+    if cached is not None and (data_version is not None or time.time() - cached[0] < CACHE_TTL):
+        diag.count(name, "hit")
+        return cached[1]
+
+    diag.count(name, "miss")
+    value = build()
+    with lock:
+        for stale in [k for k in cache if k[:2] == key[:2] and k != key]:
+            del cache[stale]
+        cache[key] = (time.time(), value)
+    return value
+
+
+def load_merged(root_dir: str, scenario_key: str, manifest: dict = None) -> pd.DataFrame:
+    """
+    Load the published snapshot of a scenario, or the two CSVs merged when there is none.
+
+    With a manifest, files are only requested when their content hash changed.
+    """
+    names = build_asset_names(scenario_key)
+
+    def _hash(kind):
+        return manifest_entry(manifest, names[kind]).get("sha256")
+
+    # Single binary read of the published snapshot (snapshots published before
+    # the float32 schema are cast once here)
+    if manifest is None or _hash("snapshot") is not None:
+        try:
+            return to_typed_frame(read_snapshot(f"{root_dir}/{names['snapshot']}", content_hash=_hash("snapshot")))
+        except FileNotFoundError:
+            pass
+
+    # Fallback: load basic summary and HDF summary (uses 'folder' as index)
+    df_basic = read_cached(f"{root_dir}/{names['basic']}", pd.read_csv, content_hash=_hash("basic"),
+                           **BASIC_CSV_OPTIONS)
+    df_hdf = read_cached(f"{root_dir}/{names['hdf']}", pd.read_csv, content_hash=_hash("hdf"), **HDF_CSV_OPTIONS)
+    with diag.span("merge"):
+        return to_typed_frame(merge_summaries(df_basic, df_hdf))
+
+
+# Merged frames kept up to date from the change log: (root_dir, scenario_key) -> (version, frame)
+_versioned_frames = {}
+_versioned_frames_lock = threading.Lock()
+
+
+def load_merged_incremental(root_dir: str, scenario_key: str, manifest: dict = None) -> pd.DataFrame:
+    """
+    load_merged, but when the manifest lists a change log only the rows changed
+    since the version held in memory are fetched and applied. Without a change
+    log the merged frame is memoized per data version.
+    """
+    names = build_asset_names(scenario_key)
+    changes_entry = manifest_entry(manifest, names["changes"])
+    latest = changes_entry.get("version")
+    if latest is None:
+        df = _memoize_by_version(_merged_frames, _merged_frames_lock, root_dir, scenario_key, manifest,
+                                 lambda: load_merged(root_dir, scenario_key, manifest), "merged_frames")
+        return df.copy(deep=False)
+
+    key = (root_dir, scenario_key)
+    with _versioned_frames_lock:
+        version, df = _versioned_frames.get(key, (None, None))
+
+    if version is None or version < changes_entry["base_version"] or version > latest:
+        # Full load of the snapshot, which is published at the latest version
+        diag.count("versioned_frames", "miss")
+        df = load_merged(root_dir, scenario_key, manifest)
+        df = df.set_index(df["Directory"].to_numpy())
+    elif version < latest:
+        diag.count("versioned_frames", "incremental")
+        offset = changes_entry["offsets"][str(version + 1)]
+        changes = read_changes(f"{root_dir}/{names['changes']}", offset, changes_entry["columns"], latest)
+        with diag.span("apply changes", rows=len(changes)):
+            df = apply_changes(df, changes)
+    else:
+        diag.count("versioned_frames", "hit")
+
+    with _versioned_frames_lock:
+        _versioned_frames[key] = (latest, df)
+    return df.reset_index(drop=True)
+
+
+def load_scenario_aggregates(root_dir: str, scenario_key: str, manifest: dict = None) -> dict:
+    """
+    Published '<scenario>_simulation_aggregates.json', or aggregates computed from the
+    row-level data once per data version (once per CACHE_TTL when it is unknown).
+    """
+    names = build_asset_names(scenario_key)
+
+    def _build():
+        aggregates_hash = manifest_entry(manifest, names["aggregates"]).get("sha256")
+        if manifest is None or aggregates_hash is not None:
+            try:
+                return read_json(f"{root_dir}/{names['aggregates']}", content_hash=aggregates_hash)
+            except FileNotFoundError:
+                pass
+        return compute_aggregates(load_merged_incremental(root_dir, scenario_key, manifest))
+
+    return _memoize_by_version(_computed_aggregates, _computed_aggregates_lock, root_dir, scenario_key, manifest,
+                               _build, "aggregates")
+
+
+def load_faceted(root_dir: str, scenario_key: str, manifest: dict = None):
+    """
+    Row-level data of a scenario together with its facet index, built once per
+    data version. The frame is a shallow copy, so adding columns to it leaves
+    the memoized one untouched.
+    """
+    def _build():
+        frame = load_merged_incremental(root_dir, scenario_key, manifest)
+        return frame, build_facet_index(frame)
+
+    df, index = _memoize_by_version(_faceted_frames, _faceted_frames_lock, root_dir, scenario_key, manifest,
+                                    _build, "faceted_frames")
+    return df.copy(deep=False), index
+
+
+# Comparison tables of scenario sets, keyed by (root_dir, set_key, data version)
+_comparison_frames = {}
+_comparison_frames_lock = threading.Lock()
+
+
+def comparison_data_version(root_dir: str, set_key: str, variants: dict, manifest: dict = None):
+    """
+    Data versions of every variant of a scenario set ({label: scenario key})
+    and of its published comparison table; None when one of them is unknown.
+    """
+    versions = [scenario_data_version(root_dir, key, manifest) for key in variants.values()]
+    if None in versions:
+        return None
+    watcher = get_watcher(root_dir)
+    if watcher is not None:
+        published = f"watched:{watcher.version(set_key)}"
+    else:
+        published = manifest_entry(manifest, build_comparison_name(set_key)).get("sha256")
+    return "|".join([*versions, str(published)])
+
+
+def load_comparison(root_dir: str, set_key: str, variants: dict, manifest: dict = None) -> pd.DataFrame:
+    """
+    Published comparison table of a scenario set ('<set>_simulation_comparison.parquet'),
+    or one built from the row-level data of its variants ({label: scenario key})
+    once per data version.
+    """
+    name = build_comparison_name(set_key)
+
+    def _build():
+        comparison_hash = manifest_entry(manifest, name).get("sha256")
+        if manifest is None or comparison_hash is not None:
+            try:
+                return read_snapshot(f"{root_dir}/{name}", content_hash=comparison_hash)
+            except FileNotFoundError:
+                pass
+        frames = {variant: load_merged_incremental(root_dir, key, manifest) for variant, key in variants.items()}
+        with diag.span("build comparison"):
+            return build_comparison(frames)
+
+    df = _memoize_by_version(_comparison_frames, _comparison_frames_lock, root_dir, set_key, manifest, _build,
+                             "comparisons", comparison_data_version(root_dir, set_key, variants, manifest))
+    return df.copy(deep=False)
+
+
+def load_portfolio(root_dir: str, scenario_keys, manifest: dict = None, max_workers: int = None):
+    """
+    Load the aggregates of several scenarios concurrently.
+
+    Yields (scenario_key, aggregates) as each scenario finishes, with the exception
+    in place of the aggregates when a scenario fails to load. Total latency is about
+    that of the slowest scenario.
+    """
+    scenario_keys = list(scenario_keys)
+    if not scenario_keys:
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(scenario_keys)) as pool:
+        futures = {
+            pool.submit(load_scenario_aggregates, root_dir, key, manifest): key
+            for key in scenario_keys
+        }
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except Exception as e:
+                yield futures[future], e
+
+
+# =============================================================================
+# Background prefetching
+# =============================================================================
+
+# Seconds between two refreshes of remote data; a watched folder is refreshed on change
+PREFETCH_INTERVAL = 60
+
+# How often the prefetcher checks the watcher of a local folder, in seconds
+PREFETCH_WATCH_INTERVAL = 0.5
+
+# Everything the dashboard shows of one scenario at one data version. Never
+# modified once published: readers get shallow copies of the frame.
+ScenarioSnapshot = namedtuple("ScenarioSnapshot", ["data_version", "aggregates", "frame", "facet_index", "loaded"])
+
+# Prefetchers started by prefetch_scenarios: root_dir -> ScenarioPrefetcher
+_prefetchers = {}
+_prefetchers_lock = threading.Lock()
+
+
+class ScenarioPrefetcher:
+    """
+    Keeps the aggregates, row-level data and facet index of every scenario
+    (and the comparison tables of the scenario sets, {set_key: {label: scenario
+    key}}) loaded in a background thread, so that page loads read memory
+    instead of files and their latency does not grow with the number of viewers.
+
+    Each refresh reads the manifest, reloads the scenarios whose data version
+    changed (concurrently, through the memoized loaders above) and publishes
+    the manifest and all snapshots at once by replacing one tuple; readers
+    never wait for a refresh nor see half of one. Remote data is refreshed
+    every interval seconds, a watched local folder once the watcher has seen
+    a change and the folder has settled.
+    """
+
+    def __init__(self, root_dir: str, scenario_keys, interval: float = PREFETCH_INTERVAL, max_workers: int = None,
+                 comparison_sets: dict = None):
+        self.root_dir = root_dir
+        self.scenario_keys = list(scenario_keys)
+        self.comparison_sets = dict(comparison_sets or {})
+        self.interval = interval
+        self.max_workers = max_workers
+        self.errors = {}
+        self.refreshed = None
+        # (manifest, {scenario_key: ScenarioSnapshot}), replaced as a whole by refresh()
+        self._published = (None, {})
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        # True once the first refresh has been published
+        return self._ready.is_set()
+
+    @property
+    def manifest(self) -> dict:
+        return self._published[0]
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def _load(self, scenario_key: str, manifest: dict, previous: ScenarioSnapshot) -> ScenarioSnapshot:
+        # The version is taken before loading, so a change made meanwhile is picked up by the next refresh
+        data_version = scenario_data_version(self.root_dir, scenario_key, manifest)
+        if previous is not None and data_version is not None and previous.data_version == data_version:
+            return previous
+        aggregates = load_scenario_aggregates(self.root_dir, scenario_key, manifest)
+        frame, facet_index = load_faceted(self.root_dir, scenario_key, manifest)
+        return ScenarioSnapshot(data_version, aggregates, frame, facet_index, time.time())
+
+    def refresh(self):
+        """
+        Reload the scenarios that changed and publish the new snapshots.
+        """
+        with self._refresh_lock:
+            t0 = time.perf_counter()
+            try:
+                manifest = read_manifest(f"{self.root_dir}/{MANIFEST_NAME}")
+            except Exception:
+                manifest = None
+
+            previous = self._published[1]
+            snapshots, errors = {}, {}
+            with ThreadPoolExecutor(max_workers=self.max_workers or len(self.scenario_keys) or 1) as pool:
+                futures = {
+                    pool.submit(self._load, key, manifest, previous.get(key)): key
+                    for key in self.scenario_keys
+                }
+                for future in as_completed(futures):
+                    key = futures[future]
+                    try:
+                        snapshots[key] = future.result()
+                    except Exception as e:
+                        errors[key] = e
+
+            # Comparison tables are memoized by load_comparison; built from the frames just loaded
+            for set_key, variants in self.comparison_sets.items():
+                try:
+                    load_comparison(self.root_dir, set_key, variants, manifest)
+                except Exception as e:
+                    errors[set_key] = e
+
+            self._published = (manifest, snapshots)
+            self.errors = errors
+            self.refreshed = time.time()
+            self._ready.set()
+
+        reloaded = sorted(key for key, snapshot in snapshots.items() if snapshot is not previous.get(key))
+        diag.log_event("prefetch", root_dir=self.root_dir, ms=round((time.perf_counter() - t0) * 1000, 1),
+                       reloaded=reloaded, errors={key: repr(e) for key, e in errors.items()})
+
+    def _wait_for_change(self) -> bool:
+        # Returns False when stopped
+        watcher = get_watcher(self.root_dir)
+        if watcher is None:
+            return not self._stop.wait(self.interval)
+
+        generation = watcher.generation
+        while not self._stop.wait(PREFETCH_WATCH_INTERVAL):
+            if watcher.generation != generation:
+                # Wait for the publisher to finish writing the scenario's files
+                while True:
+                    generation = watcher.generation
+                    if self._stop.wait(PREFETCH_WATCH_INTERVAL):
+                        return False
+                    if watcher.generation == generation:
+                        return True
+        return False
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                diag.log_event("prefetch", root_dir=self.root_dir, error=repr(e))
+            if not self._wait_for_change():
+                return
+
+    def start(self):
+        threading.Thread(target=self._run, name="scenario-prefetcher", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def get(self, scenario_key: str, manifest: dict = None) -> ScenarioSnapshot:
+        """
+        Published snapshot of a scenario when it is of the data version the
+        manifest (or the watcher) currently describes, otherwise None.
+        """
+        snapshot = self._published[1].get(scenario_key)
+        if snapshot is None:
+            diag.count("prefetched", "cold")
+            return None
+        if snapshot.data_version != scenario_data_version(self.root_dir, scenario_key, manifest):
+            diag.count("prefetched", "stale")
+            return None
+        diag.count("prefetched", "hit")
+        return snapshot
+
+    # The loaders of the app: from the published snapshot, or loaded on the
+    # request path (and memoized) while it is missing or out of date
+
+    def load_merged(self, scenario_key: str, manifest: dict = None) -> pd.DataFrame:
+        snapshot = self.get(scenario_key, manifest)
+        if snapshot is None:
+            return load_merged_incremental(self.root_dir, scenario_key, manifest)
+        return snapshot.frame.copy(deep=False)
+
+    def load_aggregates(self, scenario_key: str, manifest: dict = None) -> dict:
+        snapshot = self.get(scenario_key, manifest)
+        if snapshot is None:
+            return load_scenario_aggregates(self.root_dir, scenario_key, manifest)
+        return snapshot.aggregates
+
+    def load_faceted(self, scenario_key: str, manifest: dict = None):
+        snapshot = self.get(scenario_key, manifest)
+        if snapshot is None:
+            return load_faceted(self.root_dir, scenario_key, manifest)
+        return snapshot.frame.copy(deep=False), snapshot.facet_index
+
+    def load_comparison(self, set_key: str, manifest: dict = None) -> pd.DataFrame:
+        return load_comparison(self.root_dir, set_key, self.comparison_sets[set_key], manifest)
+
+    def load_portfolio(self, scenario_keys, manifest: dict = None, max_workers: int = None):
+        """
+        load_portfolio, yielding the prefetched scenarios first.
+        """
+        snapshots = {key: self.get(key, manifest) for key in scenario_keys}
+        for key, snapshot in snapshots.items():
+            if snapshot is not None:
+                yield key, snapshot.aggregates
+        missing = [key for key, snapshot in snapshots.items() if snapshot is None]
+        yield from load_portfolio(self.root_dir, missing, manifest, max_workers)
+
+
+def prefetch_scenarios(root_dir: str, scenario_keys, interval: float = PREFETCH_INTERVAL,
+                       comparison_sets: dict = None) -> ScenarioPrefetcher:
+    """
+    Start (once per root folder or URL and process) prefetching scenarios in the background.
+    """
+    with _prefetchers_lock:
+        prefetcher = _prefetchers.get(root_dir)
+        if prefetcher is None:
+            prefetcher = _prefetchers[root_dir] = ScenarioPrefetcher(
+                root_dir, scenario_keys, interval, comparison_sets=comparison_sets).start()
+    return prefetcher
@@ -11,7 +11,10 @@ import geopandas as gpd
 import tqdm
 from shapely.geometry import Point, Polygon, mapping, box
 import time
+import mmap
+from contextlib import contextmanager
 from datetime import datetime
+from functools import cached_property
 import re
 import contextily as ctx
 import plotly.graph_objects as go
@@ -26,6 +29,19 @@ from plotly.subplots import make_subplots
 itables.options.showIndex = True
 warnings.filterwarnings("ignore")
 
+# Memory the streaming reducers may use for the blocks they read, in bytes
+# (COJ_QC_MEMORY_MB, 512 MB by default); lower it on shared nodes
+MEMORY_BUDGET = int(float(os.environ.get('COJ_QC_MEMORY_MB', 512)) * 1024**2)
+
+# HDF5 chunk cache of an opened plan file, in bytes (COJ_QC_CHUNK_CACHE_MB, 64 MB
+# by default); the HDF5 default of 1 MB is smaller than one chunk of a large mesh
+CHUNK_CACHE_BYTES = int(float(os.environ.get('COJ_QC_CHUNK_CACHE_MB', 64)) * 1024**2)
+
+# Bytes of a compute log parsed at a time (COJ_QC_LOG_BLOCK_MB, 16 MB by default)
+LOG_BLOCK_BYTES = int(float(os.environ.get('COJ_QC_LOG_BLOCK_MB', 16)) * 1024**2)
+
+RESULTS_TIME_SERIES_PATH = '/Results/Unsteady/Output/Output Blocks/Base Output/Unsteady Time Series'
+
 
 
 
@@ -64,16 +80,150 @@ def find_matching_storm_name(partial_name, storm_list):
 
 
 def load_data(plan_file):
-    return h5py.File(plan_file, 'r')
+    """
+    open a plan file; close it with .close() or use PlanFile in a with block.
+    """
+    return PlanFile(plan_file)
 
 def get_model_info(data):
     """
     load name of the 2D perimeter in the model.
     """
-    model_info_name = data['/Results/Unsteady/Output/Output Blocks/Base Output/Unsteady Time Series/2D Flow Areas/'].keys()
+    if isinstance(data, PlanFile):
+        return data.area_name
+    model_info_name = data[f'{RESULTS_TIME_SERIES_PATH}/2D Flow Areas/'].keys()
     for mdl_inf_nm in model_info_name:
         return mdl_inf_nm
 
+
+class PlanFile:
+    """
+    HEC-RAS plan file opened read-only, with the objects, 2D area name, time
+    axis and attributes it is asked for looked up once:
+
+        with nu.PlanFile(plan_path) as plan:
+            stats = plan.reduce_result_fields(['Water Surface', 'Depth'])
+
+    It can be passed as data to every function of this module, and the
+    extract_*, reduce_* and list_hdf_* ones reading a plan file are also
+    methods of it, with the file and 2D area name bound,
+    e.g. plan.extract_result_field('Water Surface') or plan.extract_geometry().
+    chunk_cache_bytes sets the HDF5 chunk cache (rdcc_nbytes).
+    """
+
+    def __init__(self, plan_file, chunk_cache_bytes=CHUNK_CACHE_BYTES):
+        self.file = h5py.File(plan_file, 'r', rdcc_nbytes=chunk_cache_bytes)
+        self.filename = self.file.filename
+        self._objects = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._objects.clear()
+        self.file.close()
+
+    # h5py.File interface, so that the functions of this module accept a PlanFile
+
+    def __getitem__(self, path):
+        obj = self._objects.get(path)
+        if obj is None:
+            obj = self._objects[path] = self.file[path]
+        return obj
+
+    def __contains__(self, path):
+        return path in self._objects or path in self.file
+
+    def get(self, path, default=None):
+        return self[path] if path in self else default
+
+    def keys(self):
+        return self.file.keys()
+
+    @property
+    def attrs(self):
+        return self.file.attrs
+
+    # Cached lookups
+
+    @cached_property
+    def area_name(self):
+        """
+        name of the 2D flow area (perimeter) of the results.
+        """
+        return next(iter(self[f'{RESULTS_TIME_SERIES_PATH}/2D Flow Areas'].keys()))
+
+    @cached_property
+    def result_fields(self):
+        return list(self[f'{RESULTS_TIME_SERIES_PATH}/2D Flow Areas/{self.area_name}'].keys())
+
+    @cached_property
+    def timestamps(self):
+        """
+        time axis of the results, decoded at once.
+        """
+        raw = self[RESULTS_TIME_SERIES_PATH]['Time Date Stamp'][:]
+        return pd.to_datetime(raw.astype(str), format="%d%b%Y %H:%M:%S")
+
+    def attributes(self, path):
+        """
+        cleaned attributes of a group, as a dict.
+        """
+        return {k: clean_attr_value(v) for k, v in self[path].attrs.items()}
+
+    @cached_property
+    def plan_information(self):
+        return self.attributes('Plan Data/Plan Information')
+
+    @cached_property
+    def plan_parameters(self):
+        return self.attributes('Plan Data/Plan Parameters')
+
+    @cached_property
+    def volume_accounting(self):
+        return self.attributes('Results/Unsteady/Summary/Volume Accounting')
+
+    # Module functions of a plan file, with the file and 2D area name bound
+
+    def extract_geometry(self):
+        return extract_geometry(self, self.area_name)
+
+    def extract_boundary_conditions(self):
+        return extract_boundary_conditions(self, self.area_name)
+
+    def extract_results_summary(self):
+        return extract_results_summary(self)
+
+    def extract_timestamps(self):
+        return extract_timestamps(self)
+
+    def extract_result_field(self, field_name):
+        return extract_result_field(self, self.area_name, field_name)
+
+    def reduce_result_field(self, field_name, wet_threshold=None, reference=None, memory_budget=MEMORY_BUDGET):
+        return reduce_result_field(self, self.area_name, field_name, wet_threshold, reference, memory_budget)
+
+    def reduce_result_fields(self, fields, wet_depth=None, memory_budget=MEMORY_BUDGET):
+        return reduce_result_fields(self, self.area_name, fields, wet_depth, memory_budget)
+
+    def extract_cell_series(self, field_name, cells):
+        return extract_cell_series(self, self.area_name, field_name, cells)
+
+    def extract_event_field(self, field_name):
+        return extract_event_field(self, field_name)
+
+    def extract_IC_gdf(self):
+        return extract_IC_gdf(self)
+
+    def list_hdf_result_fields(self):
+        return list_hdf_result_fields(self, self.area_name)
+
+    def list_hdf_eventcondition_fields(self):
+        return list_hdf_eventcondition_fields(self, self.area_name)
+
 def plot_ts(df_wse_model1,df_wse_model2,check_cell_id):
      #check_cell_id = 357608
      plt.figure()
@@ -142,23 +292,30 @@ def extract_results_summary(data):
 
 
 
+def extract_timestamps(data):
+    """
+    time axis of the results hdf block.
+    """
+    if isinstance(data, PlanFile):
+        return data.timestamps
+    timesteps = data[RESULTS_TIME_SERIES_PATH]['Time Date Stamp'][:]
+    return pd.to_datetime(timesteps.astype(str), format="%d%b%Y %H:%M:%S")
+
+
 def extract_result_field(data, mdl_inf_nm, field_name):
     """
     extract requested variables of model outputs in the results hdf block
     """ 
     try:
         # Define base paths
-        base_path = f'/Results/Unsteady/Output/Output Blocks/Base Output/Unsteady Time Series/2D Flow Areas/{mdl_inf_nm}'
-        time_path = '/Results/Unsteady/Output/Output Blocks/Base Output/Unsteady Time Series'
+        base_path = f'{RESULTS_TIME_SERIES_PATH}/2D Flow Areas/{mdl_inf_nm}'
 
         # Extract the field data
         field_data = data[base_path][field_name][:, :]
         df_out = pd.DataFrame(field_data)
 
         # Extract and parse timestamps
-        timesteps = data[time_path]['Time Date Stamp'][:]
-        timestamps = pd.to_datetime([t.decode('utf-8') for t in timesteps], format="%d%b%Y %H:%M:%S")
-        df_out.index = timestamps
+        df_out.index = extract_timestamps(data)
 
         return df_out
 
@@ -167,6 +324,202 @@ def extract_result_field(data, mdl_inf_nm, field_name):
         return None
 
 
+# ### Streaming reducers
+#
+# Result fields are (time, cell) datasets of gigabytes per storm. The reducers
+# read them in blocks of time steps aligned to the HDF5 chunks, so that every
+# chunk is read and decompressed once, and keep only per-cell statistics.
+
+
+def time_block_rows(dataset, memory_budget=MEMORY_BUDGET, bytes_per_value=None):
+    """
+    number of time steps per block: the most whole chunks of time steps whose
+    values (bytes_per_value each, the dataset item size by default) fit the budget,
+    or fewer than a chunk when one does not fit.
+    """
+    n_time, n_cells = dataset.shape
+    bytes_per_value = bytes_per_value or dataset.dtype.itemsize
+    rows = max(1, int(memory_budget // (n_cells * bytes_per_value)))
+    chunk_rows = dataset.chunks[0] if dataset.chunks else 1
+    if rows >= chunk_rows:
+        rows -= rows % chunk_rows
+    return min(rows, n_time)
+
+
+def iter_time_blocks(dataset, block_rows, start=0):
+    """
+    yields (first time index, block) of a (time, cell) dataset, read into one
+    reused buffer: a block is only valid until the next one is read.
+    """
+    n_time, n_cells = dataset.shape
+    buffer = np.empty((min(block_rows, max(n_time - start, 1)), n_cells), dtype=dataset.dtype)
+    for first in range(start, n_time, block_rows):
+        n = min(block_rows, n_time - first)
+        dataset.read_direct(buffer, np.s_[first:first + n], np.s_[0:n])
+        yield first, buffer[:n]
+
+
+class FieldReducer:
+    """
+    running per-cell initial value, max, min, time index of the max and time
+    index at which the value first exceeds reference + wet_threshold (when a
+    threshold is given).
+    """
+
+    def __init__(self, n_cells, wet_threshold=None, reference=None):
+        self.initial = None
+        self.max = np.full(n_cells, -np.inf)
+        self.min = np.full(n_cells, np.inf)
+        self.argmax = np.full(n_cells, -1, dtype=np.int64)
+        self.wet_threshold = wet_threshold
+        self.reference = reference
+        self.first_wet = np.full(n_cells, -1, dtype=np.int64) if wet_threshold is not None else None
+
+    def update(self, first, block):
+        if self.initial is None:
+            self.initial = block[0].astype(np.float64)
+        # fmax / fmin skip NaN like DataFrame.max() does
+        block_max = np.fmax.reduce(block, axis=0)
+        np.fmin(self.min, np.fmin.reduce(block, axis=0), out=self.min)
+
+        # strictly greater: the first time of the max is kept, as idxmax() does
+        higher = block_max > self.max
+        if higher.any():
+            cells = np.flatnonzero(higher)
+            self.argmax[cells] = first + (block[:, cells] == block_max[cells]).argmax(axis=0)
+            self.max[cells] = block_max[cells]
+
+        if self.first_wet is not None:
+            if self.reference is None:
+                self.reference = self.initial
+            dry = np.flatnonzero(self.first_wet < 0)
+            if len(dry):
+                wet = block[:, dry] > (self.reference[dry] + self.wet_threshold)
+                now_wet = wet.any(axis=0)
+                self.first_wet[dry[now_wet]] = first + wet[:, now_wet].argmax(axis=0)
+
+    def result(self, timestamps=None):
+        """
+        per-cell statistics as a DataFrame indexed by cell, times as
+        timestamps when given (NaT when never reached), time indices otherwise.
+        """
+        never = self.argmax < 0
+        stats = pd.DataFrame({
+            'initial': self.initial,
+            'max': np.where(never, np.nan, self.max),
+            'min': np.where(np.isinf(self.min), np.nan, self.min),
+        })
+        indices = {'time_of_max': self.argmax}
+        if self.first_wet is not None:
+            indices['first_wet'] = self.first_wet
+        for name, index in indices.items():
+            if timestamps is None:
+                stats[name] = index
+            else:
+                stats[name] = pd.DatetimeIndex(timestamps).take(index).where(index >= 0)
+        return stats
+
+
+def reduce_result_field(data, mdl_inf_nm, field_name, wet_threshold=None, reference=None,
+                        memory_budget=MEMORY_BUDGET):
+    """
+    per-cell initial value, max, min, time of the max and, with a wet_threshold,
+    time the field first exceeds reference + wet_threshold (reference: per-cell values,
+    the first time step by default), read in chunk-aligned blocks of time steps
+    that fit memory_budget instead of the whole time x cell field.
+    """
+    try:
+        dataset = data[f'{RESULTS_TIME_SERIES_PATH}/2D Flow Areas/{mdl_inf_nm}'][field_name]
+        # a block, copies of the columns whose max changed and boolean masks
+        block_rows = time_block_rows(dataset, memory_budget, dataset.dtype.itemsize + 9)
+        reducer = FieldReducer(dataset.shape[1], wet_threshold, reference)
+        for first, block in iter_time_blocks(dataset, block_rows):
+            reducer.update(first, block)
+        return reducer.result(extract_timestamps(data))
+
+    except Exception as e:
+        print(f"!!! ERROR !!! Output not reduced properly: {e}")
+        return None
+
+
+# Fields computed from result datasets: name -> datasets they are computed from
+DERIVED_FIELDS = {
+    'Depth': ['Water Surface'],
+    'Velocity': ['Cell Velocity - Velocity X', 'Cell Velocity - Velocity Y'],
+}
+
+
+def reduce_result_fields(data, mdl_inf_nm, fields, wet_depth=None, memory_budget=MEMORY_BUDGET):
+    """
+    per-cell statistics of several result fields (as reduce_result_field
+    returns them), by field, in one pass: every dataset is read once, one
+    block of each at a time, and the timestamps are decoded once.
+
+    fields are result datasets or 'Depth' (WSE - WSE at time 0) and 'Velocity'
+    (magnitude of the cell velocity); fields whose datasets are not in the
+    plan file are left out. With wet_depth, Depth has the time the depth first
+    exceeds it.
+    """
+    try:
+        area = data[f'{RESULTS_TIME_SERIES_PATH}/2D Flow Areas/{mdl_inf_nm}']
+        missing = [field for field in fields if any(name not in area for name in DERIVED_FIELDS.get(field, [field]))]
+        if missing:
+            print(f'Warning!: {missing} outputs are not found in the plan file')
+        fields = [field for field in fields if field not in missing]
+        sources = list(dict.fromkeys(name for field in fields for name in DERIVED_FIELDS.get(field, [field])))
+        datasets = [area[name] for name in sources]
+        n_cells = datasets[0].shape[1]
+
+        # Depth is the WSE shifted by its initial value: one reducer serves both
+        reducers = {name: FieldReducer(n_cells) for name in sources if name not in DERIVED_FIELDS['Velocity']}
+        if 'Depth' in fields:
+            reducers['Water Surface'] = FieldReducer(n_cells, wet_depth)
+        for name in DERIVED_FIELDS['Velocity']:
+            if name in fields:
+                reducers[name] = FieldReducer(n_cells)
+        if 'Velocity' in fields:
+            reducers['Velocity'] = FieldReducer(n_cells)
+
+        # a block of each dataset, plus copies of the columns whose max changed and boolean masks
+        widest = max(datasets, key=lambda dataset: dataset.chunks[0] if dataset.chunks else 1)
+        block_rows = time_block_rows(widest, memory_budget, sum(d.dtype.itemsize for d in datasets) + 9)
+        for blocks in zip(*(iter_time_blocks(dataset, block_rows) for dataset in datasets)):
+            first = blocks[0][0]
+            block = {name: values for name, (_, values) in zip(sources, blocks)}
+            for name, reducer in reducers.items():
+                if name != 'Velocity':
+                    reducer.update(first, block[name])
+            if 'Velocity' in reducers:
+                # magnitude computed into the X block, which is read again next
+                velocity_x, velocity_y = (block[name] for name in DERIVED_FIELDS['Velocity'])
+                reducers['Velocity'].update(first, np.hypot(velocity_x, velocity_y, out=velocity_x))
+
+        timestamps = extract_timestamps(data)
+        stats = {name: reducer.result(timestamps) for name, reducer in reducers.items()}
+        if 'Depth' in fields:
+            depth = stats['Water Surface'].copy()
+            depth['max'] -= depth['initial']
+            depth['min'] -= depth['initial']
+            depth['initial'] = 0.0
+            stats['Depth'] = depth
+            stats['Water Surface'] = stats['Water Surface'].drop(columns='first_wet', errors='ignore')
+        return {field: stats[field] for field in fields}
+
+    except Exception as e:
+        print(f"!!! ERROR !!! Outputs not reduced properly: {e}")
+        return None
+
+
+def extract_cell_series(data, mdl_inf_nm, field_name, cells):
+    """
+    time series of a result field at a few cells (e.g. the reference points),
+    as a DataFrame with one column per cell.
+    """
+    dataset = data[f'{RESULTS_TIME_SERIES_PATH}/2D Flow Areas/{mdl_inf_nm}'][field_name]
+    cells = np.unique(np.asarray(cells, dtype=np.int64))
+    return pd.DataFrame(dataset[:, cells], index=extract_timestamps(data), columns=cells)
+
+
 
 def extract_event_field(data, field_name):
     """
@@ -230,56 +583,115 @@ def list_hdf_eventcondition_fields(data, mdl_inf_nm):
 
    return None
 
-def extract_compute_log(lines):
-    # Initialize variables
-    extracting = False
-    selected_lines = []
+# ### Compute logs
+#
+# Compute logs of unstable runs grow larger than memory. They are memory-mapped
+# and searched as bytes; only the sections and rows asked for are decoded.
 
-    # Loop through the lines and extract the desired section
-    for line in lines:
-        if start_marker in line:
-            extracting = True
-        if extracting:
-            selected_lines.append(line)
-        if end_marker in line:
-            break
+# Per-cell rows: date time, 2D area, cell, WSEL, error and iterations (tab separated)
+COMPUTE_ROW_PATTERN = rb'^(\d{2}[A-Z]{3}\d{4} \d{2}:\d{2}:\d{2})\s+%b\tCell #\t\s+(\d+)\t\s+(-?[\d.]+)\t\s+([\d.]+)\t(\d+)'
 
-    # Display the extracted lines
-    extracted_text = ''.join(selected_lines)
-    #print(extracted_text)
-    return extracted_text
+VOLUME_ERROR_LABELS = [b'Overall Volume Accounting Error in Acre Feet:', b'Overall Volume Accounting Error as percentage:']
+LABELLED_NUMBER = re.compile(rb'\s+([\d.]+)')
 
 
-def extract_error(text):
-    # Extract the values using regular expressions
-    acre_feet_match = re.search(r'Overall Volume Accounting Error in Acre Feet:\s+([\d.]+)', text)
-    percentage_match = re.search(r'Overall Volume Accounting Error as percentage:\s+([\d.]+)', text)
+@contextmanager
+def map_log(log_file):
+    """
+    read-only memory map of a log file (empty bytes for an empty file).
+    """
+    with open(log_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as log:
+            yield log
+
+
+def extract_compute_log(log_file, start_marker, end_marker):
+    """
+    text of a compute log from the line holding start_marker through the line
+    holding end_marker (or the end of the log); empty without start_marker.
+    """
+    with map_log(log_file) as log:
+        start = log.find(start_marker.encode())
+        if start < 0:
+            return ''
+        start = log.rfind(b'\n', 0, start) + 1
+        end = log.find(end_marker.encode(), start)
+        end = len(log) if end < 0 else log.find(b'\n', end) + 1 or len(log)
+        return log[start:end].decode('utf-8', errors='replace')
 
-    # Store the values in variables
-    acre_feet_error = float(acre_feet_match.group(1)) if acre_feet_match else None
-    percentage_error = float(percentage_match.group(1)) if percentage_match else None
 
-    # Output the extracted values
-    acre_feet_error, percentage_error
+def extract_error(text):
+    """
+    overall volume accounting error in acre feet and as a percentage (the last
+    ones reported) of a compute log text, str, bytes or memory map.
+    """
+    if isinstance(text, str):
+        text = text.encode()
+    errors = []
+    for label in VOLUME_ERROR_LABELS:
+        start = text.rfind(label)
+        match = LABELLED_NUMBER.match(text, start + len(label)) if start >= 0 else None
+        errors.append(float(match.group(1)) if match else None)
+    acre_feet_error, percentage_error = errors
     return acre_feet_error, percentage_error
 
 
-def get_compute_dataframe(lines):
-    data = []
-    for line in lines:
-        match = re.match(r'(\d{2}[A-Z]{3}\d{4} \d{2}:\d{2}:\d{2})\s+PERIMTER1\tCell #\t\s+(\d+)\t\s+([\d.]+)\t\s+([\d.]+)\t(\d+)', line)
-        if match:
-            dt_str, cell, wsel, error, iterations = match.groups()
-            dt = datetime.strptime(dt_str, '%d%b%Y %H:%M:%S')
-            data.append([dt, int(cell), float(wsel), float(error), int(iterations)])
+def extract_log_error(log_file):
+    """
+    extract_error of a compute log file, searched in place.
+    """
+    with map_log(log_file) as log:
+        return extract_error(log)
 
-    # Create DataFrame
-    df = pd.DataFrame(data, columns=['Datetime', 'Cell', 'WSEL', 'ERROR', 'ITERATIONS'])
-    df = df.set_index('Datetime')
-    df.index = pd.to_datetime(df.index)
 
+def parse_compute_rows(buffer, area='PERIMTER1', pos=0, endpos=None):
+    """
+    per-cell rows of a compute log (bytes or memory map, from pos to endpos at
+    line starts) as a typed DataFrame indexed by Datetime. Rows are matched in
+    one pass and converted column by column; each distinct time is parsed once.
+    """
+    pattern = re.compile(COMPUTE_ROW_PATTERN % re.escape(area.encode()), re.MULTILINE)
+    rows = pattern.findall(buffer, pos, len(buffer) if endpos is None else endpos)
+    columns = np.array(rows, dtype=bytes).reshape(-1, 5)
+
+    times, inverse = np.unique(columns[:, 0], return_inverse=True)
+    index = pd.to_datetime(times.astype(str), format='%d%b%Y %H:%M:%S')[inverse]
+    return pd.DataFrame({
+        'Cell': columns[:, 1].astype(np.int64),
+        'WSEL': columns[:, 2].astype(np.float64),
+        'ERROR': columns[:, 3].astype(np.float64),
+        'ITERATIONS': columns[:, 4].astype(np.int64),
+    }, index=pd.DatetimeIndex(index, name='Datetime'))
+
+
+def iter_compute_log(log_file, area='PERIMTER1', block_bytes=LOG_BLOCK_BYTES):
+    """
+    yields the per-cell rows of a compute log as DataFrames (see
+    parse_compute_rows), one per block of about block_bytes of whole lines,
+    so that logs larger than memory can be reduced block by block.
+    """
+    with map_log(log_file) as log:
+        size, pos = len(log), 0
+        while pos < size:
+            end = log.find(b'\n', min(pos + block_bytes, size))
+            end = size if end < 0 else end + 1
+            yield parse_compute_rows(log, area, pos, end)
+            pos = end
 
-    return df
+
+def read_compute_log(log_file, area='PERIMTER1', block_bytes=LOG_BLOCK_BYTES):
+    """
+    per-cell rows of a compute log file as one DataFrame indexed by Datetime.
+    """
+    blocks = list(iter_compute_log(log_file, area, block_bytes))
+    return pd.concat(blocks) if blocks else parse_compute_rows(b'', area)
+
+
+def get_compute_dataframe(lines):
+    return parse_compute_rows('\n'.join(line.rstrip('\n') for line in lines).encode())
 
 
 
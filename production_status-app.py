@@ -5,254 +5,327 @@ Created on Wed Feb 26 15:01:15 2026
 @author: akhalid
 """
 
-import os
+import uuid
+import numpy as np
 import pandas as pd
-import plotly.express as px
 import streamlit as st
 import plotly.graph_objects as go
-from datetime import datetime, timezone
-from time import sleep
-from stqdm import stqdm
-import requests
-from collections import defaultdict
+from datetime import datetime
+from contextlib import nullcontext
+import dashboard_utilities as du
+import dashboard_figures as dfig
+import dashboard_diagnostics as diag
+import dashboard_scenarios as ds
 
 
 # =============================================================================
-# Helper functions
+# Scenario configuration
 # =============================================================================
 
+# Scenarios, where their data is read from and how it is summarized are shared
+# with the status API (status_api.py)
+SCENARIOS = ds.SCENARIOS
+GROUPED_SCENARIOS = ds.GROUPED_SCENARIOS
+DEFAULT_SCENARIO_KEY = ds.DEFAULT_SCENARIO_KEY
+ROOT_DIR = ds.ROOT_DIR
+LOCAL_MODE = ds.LOCAL_MODE
 
 
+st.set_page_config(page_title="COJ Production Dashboard", layout="centered")
 
-def get_last_modified(owner: str, repo: str, path: str):
-    """
-    Get last commit timestamp for a given path in a GitHub repo.
-    Returns an aware datetime in UTC or None if unavailable.
-    """
-    url = f"https://api.github.com/repos/{owner}/{repo}/commits"
-    params = {"path": path, "page": 1, "per_page": 1}
+# Per-rerun timings, memory and cache hits: logged as one JSON line per rerun,
+# and shown at the bottom of the page when opened with ?diagnostics=1
+diag.configure_logging()
+SHOW_DIAGNOSTICS = st.query_params.get("diagnostics", "") not in ("", "0", "false")
+if "diagnostics_session" not in st.session_state:
+    st.session_state.diagnostics_session = uuid.uuid4().hex[:12]
+diag.start_run("rerun", session=st.session_state.diagnostics_session)
 
-    try:
-        r = requests.get(url, params=params, timeout=10)
-    except Exception:
-        return None
 
-    if r.status_code != 200:
-        return None
-
-    data = r.json()
-    if not data:
-        return None
+def finish_rerun():
+    """
+    Close the diagnostics of this rerun and, with ?diagnostics=1, show its
+    waterfall, memory and cache hit/miss counts.
+    """
+    record = diag.finish_run()
+    if not SHOW_DIAGNOSTICS or record is None:
+        return
+
+    with st.expander("Diagnostics"):
+        memory = record["memory"]
+        col1, col2, col3 = st.columns(3, gap="medium")
+        with col1:
+            st.metric("Rerun", f"{record['total_ms']:,.0f} ms")
+        with col2:
+            st.metric("Memory (RSS)", f"{memory['rss_mb']:,.0f} MB" if memory["rss_mb"] else "n/a")
+        with col3:
+            st.metric("Peak Memory", f"{memory['max_rss_mb']:,.0f} MB" if memory["max_rss_mb"] else "n/a")
+
+        if record["spans"]:
+            st.plotly_chart(dfig.waterfall_figure(record["spans"]))
+            st.dataframe(pd.DataFrame(record["spans"]), hide_index=True)
+
+        totals = diag.cache_counts()
+        cache_rows = [
+            {"Cache": cache, "Outcome": outcome, "This Rerun": record["cache"].get(cache, {}).get(outcome, 0),
+             "Since Start": n}
+            for cache, outcomes in totals.items() for outcome, n in outcomes.items()
+        ]
+        st.markdown("**Cache lookups**")
+        st.dataframe(pd.DataFrame(cache_rows), hide_index=True)
+        st.caption(f"Run {record['run']} of session {record['session']}; also logged to stderr as JSON.")
 
-    timestamp = data[0]["commit"]["committer"]["date"]  # e.g. "2026-02-20T19:22:37Z"
-    dt = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
-    return dt
 
+def stop_rerun():
+    finish_rerun()
+    st.stop()
 
-def highlight_status(row):
-    """
-    Row-wise styling for a Pandas DataFrame (if used in st.dataframe(pdStyler)).
-    """
-    color = ""
-    status = str(row.get("Status", "")).lower()
-    if status == "success":
-        color = "background-color: lightgreen"
-    elif "failed" in status:
-        color = "background-color: lightcoral"
-    elif status == "running":
-        color = "background-color: lightblue"
-    return [color] * len(row)
 
+def plot_chart(name: str, fig, **kwargs):
+    # Plotly serialization and sending, timed per chart (the build is timed in cached_figure)
+    with diag.span(f"chart {name}"):
+        st.plotly_chart(fig, **kwargs)
 
 # =============================================================================
-# Scenario configuration
+# Data loading helpers (cached)
 # =============================================================================
 
-# Centralized scenario registry
-SCENARIOS = {
-    "erdc_baseline_reruns": {
-         "title": "ERDC BASELINE",
-         "category": "Base",
-         "start_date": datetime(2026, 1, 1),
-         "completion_date_projected": datetime(2026, 1, 15),
-         "completion_date_actual": datetime(2026, 1, 15),       
-         "total_simulations": 505,
-     },
-    "a_optimal_sample_base": {
-        "title": "Optimal Sample - BASE - NO SLR",
-        "category": "Tropical Cyclones",
-        "start_date": datetime(2026, 1, 1),
-        "completion_date_projected": datetime(2026, 1, 15),
-        "completion_date_actual": datetime(2026, 1, 25),        
-        "total_simulations": 10000,
-    },
-    "optimal_sample_SLR4": {
-        "title": "Optimal Sample - SLR - IntHigh 2070",
-        "category": "Tropical Cyclones",
-        "start_date": datetime(2026, 2, 6),
-        "completion_date_projected": datetime(2026, 2, 24),
-        "completion_date_actual": datetime(2026, 3, 3),
-        "total_simulations": 10000,
-    },
-    "optimal_sample_SLR1": {
-        "title": "Optimal Sample - SLR - IntLow 2040",
-        "category": "Tropical Cyclones",
-        "start_date": datetime(2026, 3, 23),
-        "completion_date_projected": datetime(2026, 4, 10),
-        "completion_date_actual": datetime(2026, 4, 23),
-        "total_simulations": 10000,
-    },
-    "synthetic_nontc_base": {
-        "title": "Synthetic Non-TC - BASE - NO SLR",
-        "category": "Non-Tropical Cyclones",
-        "start_date": datetime(2026, 5, 14),
-        "completion_date_projected": datetime(2026, 5, 20),
-        "completion_date_actual": datetime(2026, 5, 20),
-        "total_simulations": 3648,
-    },
-    "synthetic_nontc_slr1": {
-        "title": "Synthetic Non-TC - SLR - IntLow 2040",
-        "category": "Non-Tropical Cyclones",
-        "start_date": datetime(2026, 5, 23),
-        "completion_date_projected": datetime(2026, 5, 28),
-        "completion_date_actual": datetime(2026, 5, 26),
-        "total_simulations": 3648,
-    },
-    "synthetic_nontc_slr4": {
-        "title": "Synthetic Non-TC - SLR - IntHigh 2070",
-        "category": "Non-Tropical Cyclones",
-        "start_date": datetime(2026, 5, 27),
-        "completion_date_projected": datetime(2026, 5, 31),
-        "completion_date_actual": datetime(2026, 5, 31),
-        "total_simulations": 3648,
-    },
+# Loading goes through dashboard_utilities: URLs are revalidated with conditional
+# GETs against an on-disk cache, and files whose content hash in the manifest did
+# not change are neither requested nor reparsed. A background thread shared by
+# all sessions keeps every scenario loaded; sessions read its snapshots and only
+# load on the request path while a snapshot is missing or out of date.
+@st.cache_resource
+def get_asset_watcher():
+    # One watcher per process; None for remote data
+    return ds.start_watcher()
 
 
-}
+@st.cache_resource
+def get_prefetcher():
+    # One prefetcher per process, shared by all sessions
+    return ds.start_prefetcher()
+
 
-def group_scenarios(scenarios):
-    grouped = defaultdict(dict)
-    for key, cfg in scenarios.items():
-        category = cfg.get("category", "Other")
-        grouped[category][key] = cfg
-    return grouped
-GROUPED_SCENARIOS = group_scenarios(SCENARIOS)
+@diag.timed("load_manifest")
+def load_manifest():
+    return ds.current_manifest(get_prefetcher())
 
 
+@diag.timed("load_merged_dataframe")
+def load_merged_dataframe(scenario_key: str) -> pd.DataFrame:
+    """
+    Loads the pre-merged Parquet snapshot for a scenario when it has been published
+    (see PUBLISH_DASHBOARD_ASSETS.py), otherwise loads the two CSVs and merges them.
+    While a scenario is running only the rows in its change log since the last
+    refresh are fetched and applied.
+    """
+    return get_prefetcher().load_merged(scenario_key, load_manifest())
 
-# Default scenario key (as requested)
-DEFAULT_SCENARIO_KEY = "synthetic_nontc_slr4"
 
-# Data root
-ROOT_DIR = r"https://raw.githubusercontent.com/akhalid-twi/COJ-production/refs/heads/main/assets"
+@diag.timed("load_scenario_aggregates")
+def load_scenario_aggregates(scenario_key: str) -> dict:
+    """
+    Counts, SU total, p95 thresholds and correlation matrix for the overview.
+    Uses the published '<scenario>_simulation_aggregates.json' (a few KB), otherwise
+    computes them from the row-level data once per data version.
+    """
+    return get_prefetcher().load_aggregates(scenario_key, load_manifest())
 
 
+@diag.timed("get_last_updated_dt")
+def get_last_updated_dt(scenario_key: str):
+    """
+    Detects last modified time for the basic summary CSV (see dashboard_scenarios.last_updated_dt).
+    """
+    return ds.last_updated_dt(scenario_key, load_manifest())
 
-st.set_page_config(page_title="COJ Production Dashboard", layout="centered")
 
 # =============================================================================
-# Data loading helpers (cached)
+# App UI
 # =============================================================================
 
-@st.cache_data(ttl=60)  # refresh every 60 seconds
-def load_csv(path: str) -> pd.DataFrame:
-    return pd.read_csv(path)
-
-
-@st.cache_data(ttl=60)  # refresh every 60 seconds
-def load_csv_with_index(path: str, index_col: str) -> pd.DataFrame:
-    return pd.read_csv(path, index_col=index_col)
+st.title("COJ Production Dashboard")
+st.markdown("---")
 
 
-def build_paths(scenario_key: str):
-    csv_basic = f"{scenario_key}_simulation_basic_summary.csv"
-    csv_hdf = f"{scenario_key}_simulation_HDF_summary.csv"
-    url_basic = f"{ROOT_DIR}/{csv_basic}"
-    url_hdf = f"{ROOT_DIR}/{csv_hdf}"
-    return csv_basic, csv_hdf, url_basic, url_hdf
+def watched_versions(scenario_keys):
+    watcher = get_asset_watcher()
+    return (watcher.version(None), *(watcher.version(key) for key in scenario_keys))
 
 
-def load_merged_dataframe(scenario_key: str) -> pd.DataFrame:
+@st.fragment(run_every=1)
+def rerun_on_change(scenario_keys, rendered_versions):
     """
-    Loads the two CSVs for a scenario, merges/aligns them and returns a single DataFrame.
+    Local mode: checks the watcher once a second and reruns the app when a file
+    of the displayed scenarios (or the manifest) changed since the page was
+    rendered. Nothing is read from disk here.
     """
-    csv_basic, csv_hdf, url_basic, url_hdf = build_paths(scenario_key)
-
-    # Load basic summary
-    df_basic = load_csv(url_basic)
-    # Standardize index
-    df_basic["_index"] = df_basic["Directory"]
-    df_basic = df_basic.set_index("_index")
-
-    # Load HDF summary (uses 'folder' as index)
-    df_hdf = load_csv_with_index(url_hdf, index_col="folder")
-
-    # Merge HDF-derived metrics into df_basic
-    # We assign by aligned index; ensure the indices match logically
-    # If directories differ from folder keys, consider a join/merge with a key mapping
-    if "max_wse" in df_hdf.columns:
-        df_basic["Max WSE (ft)"] = df_hdf["max_wse"]
-    if "max_depth" in df_hdf.columns:
-        df_basic["Max Depth (ft)"] = df_hdf["max_depth"]
-    if "max_volume" in df_hdf.columns:
-        df_basic["Max Volume (ft^3)"] = df_hdf["max_volume"]
-    if "max_flow_balance" in df_hdf.columns:
-        df_basic["Max Flow Balance (ft^3/s)"] = df_hdf["max_flow_balance"]
-
-    # Stage BC (two potential column names)
-    if "max_bc_stage" in df_hdf.columns:
-        df_basic["Max Stage BC (ft)"] = df_hdf["max_bc_stage"]
-    elif "max_bc_stage_EventCond" in df_hdf.columns:
-        df_basic["Max Stage BC (ft)"] = df_hdf["max_bc_stage_EventCond"]
-
-    # Flow BC (two potential column names)
-    if "max_bc_flow" in df_hdf.columns:
-        df_basic["Max Inflow BC (cfs)"] = df_hdf["max_bc_flow"]
-    elif "max_bc_flow_EventCond" in df_hdf.columns:
-        df_basic["Max Inflow BC (cfs)"] = df_hdf["max_bc_flow_EventCond"]
-
-    # Cum PRCP
-    if "max_prcp_EventCond" in df_hdf.columns:
-        df_basic["Max Cum PRCP (in)"] = df_hdf["max_prcp_EventCond"]
-    
-        
+    if watched_versions(scenario_keys) != rendered_versions:
+        st.rerun(scope="app")
 
-    # Sorting & reset for display
-    if "Directory" in df_basic.columns:
-        df_basic = df_basic.sort_values(by="Directory")
-    df_basic = df_basic.reset_index(drop=True)
-    return df_basic
+view_mode = st.radio("View", options=["Single Scenario", "Portfolio", "Compare Variants"], horizontal=True,
+                     key="view_mode")
 
+# =============================================================================
+# Portfolio: every scenario side by side, loaded concurrently
+# =============================================================================
 
-def get_last_updated_dt(scenario_key: str):
-    """
-    Detects last modified time for the basic summary CSV.
-    Works for GitHub raw URLs via the GitHub API.
-    """
-    csv_basic, _, _, _ = build_paths(scenario_key)
+if view_mode == "Portfolio":
+    if LOCAL_MODE:
+        rerun_on_change(list(SCENARIOS), watched_versions(SCENARIOS))
+    st.subheader("Portfolio Overview")
+
+    portfolio_start = datetime.now()
+    portfolio_progress = st.progress(0.0, text="Loading scenarios…")
+    portfolio = {}
+    with diag.span("load_portfolio"):
+        for n_loaded, (key, result) in enumerate(get_prefetcher().load_portfolio(SCENARIOS, load_manifest()), start=1):
+            portfolio[key] = result
+            portfolio_progress.progress(n_loaded / len(SCENARIOS),
+                                        text=f"Loaded {n_loaded}/{len(SCENARIOS)}: {SCENARIOS[key]['title']}")
+    portfolio_progress.empty()
+    st.caption(f"Loaded {len(SCENARIOS)} scenarios in {(datetime.now() - portfolio_start).total_seconds():.1f} s")
+
+    portfolio_rows = []
+    for key, cfg in SCENARIOS.items():
+        if isinstance(portfolio[key], Exception):
+            st.warning(f"Could not load '{cfg['title']}': {portfolio[key]}")
+            continue
+        summary = du.summarize_aggregates(portfolio[key], cfg.get("total_simulations"))
+        portfolio_rows.append({"Category": cfg.get("category", "Other"), "Scenario": cfg["title"], **summary})
+    portfolio_df = pd.DataFrame(portfolio_rows)
+
+    portfolio_columns = {
+        "Scenario": "Scenario",
+        "progress_pct": "Progress (%)",
+        "completed": "Completed",
+        "running": "Running",
+        "failed": "Failed",
+        "total": "Total",
+        "total_sus": "SUs",
+        "failure_rate_pct": "Failure Rate (%)",
+    }
 
-    if "githubusercontent" not in ROOT_DIR:
-        try:
-            modified_timestamp = os.path.getmtime(f"{ROOT_DIR}/{csv_basic}")
-            modified_datetime = datetime.fromtimestamp(modified_timestamp, tz=timezone.utc)
-        except Exception:
-            modified_datetime = None
-    else:
-        # Path within repo
-        modified_datetime = get_last_modified(
-            owner="akhalid-twi",
-            repo="COJ-production",
-            path=f"assets/{csv_basic}",
+    for category in GROUPED_SCENARIOS:
+        category_df = portfolio_df[portfolio_df["Category"] == category] if len(portfolio_df) else portfolio_df
+        if category_df.empty:
+            continue
+
+        st.markdown(f"#### {category}")
+        category_total = category_df["total"].sum()
+        category_finished = category_df["completed"].sum()
+        col1, col2, col3 = st.columns(3, gap="medium")
+        with col1:
+            st.metric("Completed", f"{category_finished:,} / {category_total:,}")
+        with col2:
+            st.metric("SUs Used", f"{category_df['total_sus'].sum():,.0f}")
+        with col3:
+            st.metric("Failed", f"{category_df['failed'].sum():,}")
+
+        st.dataframe(
+            category_df[list(portfolio_columns)].rename(columns=portfolio_columns),
+            hide_index=True,
+            column_config={
+                "Progress (%)": st.column_config.ProgressColumn(min_value=0, max_value=100, format="%.0f%%"),
+                "SUs": st.column_config.NumberColumn(format="%.0f"),
+                "Failure Rate (%)": st.column_config.NumberColumn(format="%.2f"),
+            },
         )
-    return modified_datetime
 
+    if len(portfolio_df):
+        col1, col2 = st.columns(2, gap="medium")
+        with col1:
+            fig_portfolio_sus = go.Figure(go.Bar(x=portfolio_df["Scenario"], y=portfolio_df["total_sus"],
+                                                 marker_color="steelblue"))
+            fig_portfolio_sus.update_layout(title="SUs Used", height=400)
+            plot_chart("portfolio SUs", fig_portfolio_sus)
+        with col2:
+            fig_portfolio_fail = go.Figure(go.Bar(x=portfolio_df["Scenario"], y=portfolio_df["failure_rate_pct"],
+                                                  marker_color="lightcoral"))
+            fig_portfolio_fail.update_layout(title="Failure Rate (%)", height=400)
+            plot_chart("portfolio failure rate", fig_portfolio_fail)
+
+    stop_rerun()
 
 # =============================================================================
-# App UI
+# Compare Variants: the same storms under Base and sea-level rise, storm by storm
 # =============================================================================
 
-st.title("COJ Production Dashboard")
-st.markdown("---")
+# Storms listed in the largest-change table
+MAX_COMPARISON_ROWS = 100
+
+if view_mode == "Compare Variants":
+    comparison_key = st.selectbox(
+        "Scenario Set", options=list(ds.COMPARISON_SETS),
+        format_func=lambda k: ds.COMPARISON_SETS[k]["title"], key="comparison_set",
+    )
+    comparison_cfg = ds.COMPARISON_SETS[comparison_key]
+    # The watcher counts the published comparison table under the set key
+    comparison_files = [*comparison_cfg["variants"].values(), comparison_key]
+    if LOCAL_MODE:
+        rerun_on_change(comparison_files, watched_versions(comparison_files))
+    st.subheader(f"{comparison_cfg['title']}: {' vs '.join(comparison_cfg['variants'])}")
+
+    try:
+        with diag.span("load_comparison"):
+            comparison = get_prefetcher().load_comparison(comparison_key, load_manifest())
+    except Exception as e:
+        st.error(f"Failed to load the comparison of '{comparison_cfg['title']}': {e}")
+        stop_rerun()
+
+    variants = du.comparison_variants(comparison)
+    baseline, others = variants[0], variants[1:]
+    class_columns = {v: du.variant_column("Status Class", v) for v in variants}
+    changed = {v: comparison[class_columns[baseline]] != comparison[class_columns[v]] for v in others}
+
+    metric_cols = st.columns(1 + len(others), gap="medium")
+    with metric_cols[0]:
+        paired = (comparison[list(class_columns.values())] != du.MISSING_CLASS).all(axis=1)
+        st.metric("Storms in All Variants", f"{int(paired.sum()):,} / {len(comparison):,}")
+    for col, variant in zip(metric_cols[1:], others):
+        with col:
+            st.metric(f"Status Changed ({baseline} → {variant})", f"{int(changed[variant].sum()):,}")
+
+    metric = st.radio("Metric", du.COMPARISON_METRICS, horizontal=True, key="comparison_metric")
+    fig_deltas = dfig.cached_figure(
+        comparison_key, dfig.delta_histogram_figure, others,
+        *[comparison[du.delta_column(metric, v, baseline)] for v in others],
+        title=f"Change in {metric} from {baseline}", x_title=f"Δ {metric}",
+    )
+    plot_chart("comparison deltas", fig_deltas)
+
+    transition_cols = st.columns(len(others), gap="medium")
+    for col, variant in zip(transition_cols, others):
+        counts = pd.crosstab(comparison[class_columns[baseline]], comparison[class_columns[variant]])
+        counts = counts.loc[counts.sum(axis=1) > 0, counts.sum(axis=0) > 0]
+        with col:
+            fig_transitions = dfig.cached_figure(
+                comparison_key, dfig.transition_figure, counts.to_numpy(), counts.index.astype(str),
+                counts.columns.astype(str), title=f"Status Class: {baseline} → {variant}",
+                x_title=variant, y_title=baseline,
+            )
+            plot_chart(f"comparison transitions {variant}", fig_transitions)
+
+    st.markdown(f"**Largest changes in {metric}**")
+    col1, col2 = st.columns(2, gap="medium")
+    with col1:
+        table_variant = st.selectbox("Variant", options=others, index=len(others) - 1, key="comparison_variant")
+    with col2:
+        only_changed = st.toggle("Only storms whose status class changed", key="comparison_only_changed")
+    delta = du.delta_column(metric, table_variant, baseline)
+    rows = comparison[changed[table_variant]] if only_changed else comparison
+    largest = rows[delta].abs().nlargest(MAX_COMPARISON_ROWS).index
+    table_columns = [
+        "Storm ID",
+        *[du.variant_column("Status", v) for v in variants],
+        *[du.variant_column(metric, v) for v in variants],
+        delta,
+    ]
+    st.dataframe(rows.loc[largest, table_columns], hide_index=True)
+    st.caption(f"{len(largest):,} of {len(rows):,} storms, by absolute change")
+
+    stop_rerun()
 
 # 1. Initialize global states cleanly
 if "scenario_current" not in st.session_state:
@@ -302,10 +375,9 @@ new_selection = display_to_key[selected_display]
 if st.session_state.scenario_current != new_selection:
     st.session_state.scenario_current = new_selection
     st.session_state.scenario_changed = True
-    try:
-        _load_df_cached.clear()
-    except Exception:
-        pass
+    # Facet values differ between scenarios
+    for widget_key in [k for k in st.session_state if str(k).startswith("facet_") and k != "facet_filter"]:
+        del st.session_state[widget_key]
 
 # Finalize active configuration details
 scenario_key = st.session_state.scenario_current
@@ -313,15 +385,70 @@ scenario_cfg = SCENARIOS[scenario_key]
 
 st.markdown("---")
 st.caption(f"Selected Scenario: **{scenario_cfg['title']}** ({scenario_cfg['category']})")
+if LOCAL_MODE:
+    rerun_on_change([scenario_key], watched_versions([scenario_key]))
 
 # ---------------------------------------------------------------------
-# Helpers: Last updated + cached loader
+# Storm filters (sidebar): one precomputed bitmap per facet value, so
+# combining filters is a vectorized AND and every chart below is
+# recomputed on the matching storms
 # ---------------------------------------------------------------------
-@st.cache_data(show_spinner=False)
-def _load_df_cached(_scenario_key: str):
-    # Your heavy loader (I/O, compute, merges, etc.)
-    return load_merged_dataframe(_scenario_key)
+@diag.timed("load_faceted_dataframe")
+def load_faceted_dataframe(scenario_key: str):
+    return get_prefetcher().load_faceted(scenario_key, load_manifest())
+
 
+# Facets with more values than this get a range slider instead of a multiselect
+MAX_FACET_OPTIONS = 20
+
+df_faceted = None
+filter_active = False
+with st.sidebar:
+    st.header("Filter Storms")
+    if st.toggle("Filter by storm parameters and status", key="facet_filter"):
+        try:
+            df_faceted, facet_index = load_faceted_dataframe(scenario_key)
+        except Exception as e:
+            st.error(f"Failed to load storms for filtering: {e}")
+            facet_index = {"rows": 0, "facets": {}}
+
+        def _selected_values(facet, widget_value, values):
+            # Range sliders select every value in the range; the full range selects nothing
+            if isinstance(widget_value, tuple):
+                if widget_value == (values[0], values[-1]):
+                    return []
+                return [v for v in values if widget_value[0] <= v <= widget_value[1]]
+            return list(widget_value or [])
+
+        facet_values = {facet: list(bitmaps) for facet, bitmaps in facet_index["facets"].items()}
+        facet_selections = {
+            facet: _selected_values(facet, st.session_state.get(f"facet_{facet}"), values)
+            for facet, values in facet_values.items()
+        }
+        counts = du.facet_counts(facet_index, facet_selections)
+
+        for facet, values in facet_values.items():
+            if len(values) > MAX_FACET_OPTIONS and facet in du.STORM_COMPONENTS:
+                widget_value = st.slider(
+                    facet, min_value=values[0], max_value=values[-1], value=(values[0], values[-1]),
+                    key=f"facet_{facet}",
+                )
+            else:
+                widget_value = st.multiselect(
+                    facet, options=values, key=f"facet_{facet}",
+                    format_func=lambda v, f=facet: f"{du.facet_label(f, v)} ({counts[f][v]:,})",
+                )
+            facet_selections[facet] = _selected_values(facet, widget_value, values)
+
+        filter_active = any(facet_selections.values())
+        if filter_active:
+            facet_mask = du.filter_mask(facet_index, facet_selections)
+            df_faceted = df_faceted[facet_mask].reset_index(drop=True)
+            st.caption(f"{len(df_faceted):,} of {facet_index['rows']:,} storms match")
+
+# ---------------------------------------------------------------------
+# Helpers: Last updated
+# ---------------------------------------------------------------------
 def _get_last_updated_safe(_scenario_key: str):
     try:
         return get_last_updated_dt(_scenario_key)
@@ -339,7 +466,7 @@ def _get_last_updated_safe(_scenario_key: str):
 force_spinner = st.session_state.scenario_changed
 
 spinner_msg = f"Loading '{scenario_cfg.get('title', scenario_key)}' — fetching data and rendering…"
-context_manager = st.spinner(spinner_msg) if force_spinner else st.empty()
+context_manager = st.spinner(spinner_msg) if force_spinner else nullcontext()
 
 with context_manager:
     # --- Last Updated ---
@@ -349,22 +476,25 @@ with context_manager:
     else:
         st.caption("Last updated: Unknown (GitHub API limit or network issue)")
 
-    # --- Data Loading (cached, no inner spinner to avoid double spinner) ---
+    # --- Aggregates (a few KB; row-level data only loads for the per-storm sections) ---
     try:
-        #df = _load_df_cached(scenario_key)
-        df = load_merged_dataframe(scenario_key)
+        agg = load_scenario_aggregates(scenario_key)
     except Exception as e:
         st.error(f"Failed to load data for scenario '{scenario_key}': {e}")
-        st.stop()
+        stop_rerun()
+
+    # Filtered storms: same aggregates, computed on the matching rows
+    if filter_active:
+        agg = du.compute_aggregates(df_faceted)
+        st.info(f"Showing {agg['rows']:,} storms matching the sidebar filters.")
 
     # --- Derived metrics (your processing) ---
 
-    df_not_running = df[df.Status!='Running']
-    running_on_psc = int(len(df[df.Status=='Running']))
+    running_on_psc = agg["running"]
 
-    total_simulations = int(scenario_cfg.get("total_simulations", 10_000))
+    total_simulations = agg["rows"] if filter_active else int(scenario_cfg.get("total_simulations", 10_000))
 
-    completed_simulations = int(len(df_not_running) if df_not_running is not None else 0)
+    completed_simulations = agg["not_running"]
     progress_percent = min(int((completed_simulations / total_simulations) * 100), 100)
 
     # --- Plotting (keep your plotting inside spinner so it covers render time) ---
@@ -445,17 +575,11 @@ with context_manager:
 # Status Count
 # =============================================================================
 
-# Filter simulations by status
-success_df = df[df["Status"] == "SUCCESS"].copy()
-failed_df = df[df["Status"].str.contains("Failed", case=False, na=False)]
-running_df = df[df["Status"] == "Running"].copy()
-
-
 # Simulated counts
-completed_count = len(success_df) + len(failed_df)
-running_count = len(running_df)
-failed_count = len(failed_df)
-successful_count = len(success_df)
+completed_count = agg["success"] + agg["failed"]
+running_count = agg["running"]
+failed_count = agg["failed"]
+successful_count = agg["success"]
 
 
 waiting_count = total_simulations - (completed_count + running_count)
@@ -468,45 +592,10 @@ waiting_count = max(0, waiting_count)
 st.subheader("Completed vs Running Simulations (Stacked)")
 
 
-completed_count = len(success_df) + len(failed_df)
-running_count = len(running_df)
-waiting_count = total_simulations - (completed_count + running_count)
-waiting_count = max(waiting_count, 0)  # avoid negative
-
-fig_completion = go.Figure()
-
-fig_completion.add_trace(go.Bar(
-    y=["Simulations"],
-    x=[completed_count],
-    name="Completed",
-    orientation='h',
-    marker=dict(color='lightgreen')
-))
-
-fig_completion.add_trace(go.Bar(
-    y=["Simulations"],
-    x=[running_count],
-    name="Running",
-    orientation='h',
-    marker=dict(color='skyblue')
-))
-
-fig_completion.add_trace(go.Bar(
-    y=["Simulations"],
-    x=[waiting_count],
-    name="Waiting",
-    orientation='h',
-    marker=dict(color='lightgray')
-))
-
-fig_completion.update_layout(
-    barmode='stack',
-    xaxis_title="Count",
-    xaxis=dict(range=[0, total_simulations]),
-    height=225
+fig_completion = dfig.cached_figure(
+    scenario_key, dfig.completion_figure, completed_count, running_count, waiting_count, total_simulations
 )
-
-st.plotly_chart(fig_completion)
+plot_chart("completion", fig_completion)
 
 
 #------------------------------
@@ -514,113 +603,112 @@ st.plotly_chart(fig_completion)
 #------------------------------
 st.subheader("Simulation Status Distribution")
 
-# Get value counts
-status_counts = df["Status"].value_counts().reset_index()
-status_counts.columns = ["Status", "Count"]
-
-# Define custom colors for each status
-color_map = {
-    "SUCCESS": "#90EE90",
-    "Running": "skyblue",
-    "UNSTABLE-FAILED": "#FF7F7F",
-    "SLURM_TIMEOUT-FAILED": "#FFD700",
-    "DISK-FAILED": "#FFD700",
-    "HDF-FAILED": "#FFD700"
-}
-
-status_counts["Color"] = status_counts["Status"].map(color_map).fillna("orange")
-
-# Create Plotly bar chart
-fig_status = go.Figure()
-
-for _, row in status_counts.iterrows():
-    fig_status.add_trace(go.Bar(
-        x=[row["Status"]],
-        y=[row["Count"]],
-        name=row["Status"],
-        marker_color=row["Color"],
-        text=row["Count"],
-        textposition="outside"
-    ))
-
-fig_status.update_layout(
-    title="Status Type Counts",
-    xaxis_title="Status",
-    yaxis_title="Count",
-    showlegend=False,
-    height=500,
-    yaxis=dict(range=[0, 10000])  # Set y-axis range
-)
-
-st.plotly_chart(fig_status)
+# One bar per status, colored by dfig.STATUS_BAR_COLORS
+fig_status = dfig.cached_figure(scenario_key, dfig.status_count_figure, agg["status_counts"])
+plot_chart("status counts", fig_status)
 
 #------------------------------
 # Pie chart of success vs failure
 #------------------------------
-status_counts = df["Status"].value_counts().reset_index()
-status_counts.columns = ["Status", "Count"]
+fig_pie = dfig.cached_figure(scenario_key, dfig.status_pie_figure, agg["status_counts"])
+#st.subheader("Simulation Status Distribution")
+plot_chart("status pie", fig_pie)
 
-color_map = {
-    "SUCCESS": "#90EE90",        # Light Green (Success)
-    "Running": "skyblue",        # Light Blue (In Progress)
-    "UNSTABLE-FAILED": "#FF7F7F",# Soft Red (Unstable Failure)
-    "SLURM_TIMEOUT-FAILED": "#FFA500", # Orange (Timeout)
-    "DISK-FAILED": "#FFD700",    # Gold (Disk Issue)
-    "HDF-FAILED": "#FFD700",     # Gold (HDF Issue)
-    "FAILED": "#FF6347"          #
-}
 
-fig_pie = px.pie(
-    status_counts,
-    names="Status",
-    values="Count",
-    title="Failure vs Success Distribution",
-    color="Status",
-    color_discrete_map=color_map
-)
-#st.subheader("Simulation Status Distribution")
-st.plotly_chart(fig_pie)
+#--------------------------
+# correlation metrics
+#--------------------------
+
+# Fragment with a lazy expander: the heatmap is only built and sent while it is open
+@st.fragment
+@diag.timed_fragment()
+def correlation_section(scenario_key, correlation):
+    corr_expander = st.expander("Correlation Metrics", key="show_correlation", on_change="rerun")
+    if corr_expander.open:
+        with corr_expander:
+            fig_corr = dfig.cached_figure(
+                scenario_key, dfig.correlation_figure, correlation["columns"], correlation["values"]
+            )
+            plot_chart("correlation", fig_corr)
+
+
+correlation_section(scenario_key, agg["correlation"])
+
+# We reached here without exception; clear the change flag so spinner doesnot reappear
+st.session_state.scenario_changed = False
+
+
+# =============================================================================
+#  Per-storm sections (row-level data)
+# =============================================================================
+
+st.markdown("---")
+if not st.toggle("Show per-storm sections (loads row-level data)", key="show_per_storm"):
+    stop_rerun()
+
+try:
+    df = df_faceted if df_faceted is not None else load_merged_dataframe(scenario_key)
+except Exception as e:
+    st.error(f"Failed to load data for scenario '{scenario_key}': {e}")
+    stop_rerun()
+
+# Storms of the basic summary without an HDF row, as found by the publisher
+merge_report = du.manifest_entry(load_manifest(), du.build_asset_names(scenario_key)["snapshot"]).get("merge", {})
+if merge_report.get("basic_only"):
+    st.caption(f"⚠️ {merge_report['basic_only']:,} storms have no HDF summary row; their HDF metrics are empty "
+               f"(e.g. {', '.join(merge_report['examples'])}).")
+
+# Frames are typed by dashboard_utilities (categorical Status, float32 metrics) and
+# shared between sessions: derived frames below add columns to shallow copies
+# instead of copying or re-converting the data.
+
+# One vectorized class per status (Success / Running / Failed / Other)
+with diag.span("classify_status"):
+    df["Status Class"] = du.classify_status(df["Status"])
 
 
 # =============================================================================
 #  SU usage
 # =============================================================================
 
-# Convert SUs to numeric
-success_df["SUs"] = pd.to_numeric(success_df["SUs"], errors='coerce')
-total_sus = success_df["SUs"].sum()
+# Only the charted columns of the successful runs
+success_df = df.loc[df["Status"] == "SUCCESS", ["SUs", "Directory"]]
 
 # Create numeric storm numbering
 success_df = success_df.reset_index(drop=True)
 success_df["Storm Number"] = success_df.index + 1
 
+# Chart rendering for the one-bar-per-storm charts below
+with st.expander("Chart settings"):
+    chart_mode = st.selectbox(
+        "Per-storm chart rendering",
+        options=dfig.CHART_MODES,
+        help="Auto draws every storm up to the point limit and bins larger scenarios; "
+             "storms above p95 (and failures) are always listed individually.",
+        key="chart_mode",
+    )
+    chart_max_points = st.number_input(
+        "Point limit for Auto", min_value=100, value=dfig.MAX_FULL_POINTS, step=100, key="chart_max_points"
+    )
+
 # SU usage plot
 st.subheader("Service Units (SUs) Used per Successful Simulation")
-st.markdown(f"**Total SUs Used:** {total_sus:,}")
+st.markdown(f"**Total SUs Used:** {agg['total_sus'] or 0:,}")
 
-fig_su = px.bar(
-    success_df,
-    x="Storm Number",
-    y="SUs",
-    color="SUs",
+fig_su = dfig.cached_figure(
+    scenario_key, dfig.storm_bar_figure,
+    success_df["Storm Number"],
+    success_df["SUs"],
+    success_df["Directory"],
     title="SUs per Successful Run",
-    hover_data={
-        "Directory": True,
-        "Storm Number": False
-    }
-)
-
-fig_su.update_traces(
-    hovertemplate=
-    "<b>Storm:</b> %{customdata[0]}<br>" +
-    "<b>SUs:</b> %{y:,.0f}<extra></extra>"
-)
-
-fig_su.update_layout(
-    xaxis_title="Storm Number"
+    y_title="SUs",
+    colorscale="Plasma",
+    threshold=agg["p95"].get("SUs"),
+    mode=chart_mode,
+    max_points=chart_max_points,
 )
 
-st.plotly_chart(fig_su, config={"responsive": True})
+plot_chart("SUs", fig_su, config={"responsive": True})
 
 # =============================================================================
 # Error plots for key metrics
@@ -628,28 +716,6 @@ st.plotly_chart(fig_su, config={"responsive": True})
 
 st.subheader("Error plots for key metrics")
 
-# Convert columns to numeric
-df["Vol Error (AF)"] = pd.to_numeric(df["Vol Error (AF)"], errors='coerce')
-df["Vol Error (%)"] = pd.to_numeric(df["Vol Error (%)"], errors='coerce')
-df["Max WSEL Err"] = pd.to_numeric(df["Max WSEL Err"], errors='coerce')
-
-
-def categorize_by_status(status):
-    status = str(status).strip().lower()
-
-    if status == "success":
-        return "Success"         # green
-    elif status == "running":
-        return "Running"         # cyan
-    elif "failed" in status:
-        return "Failed"          # red
-    else:
-        return "Other"           # orange
-
-# Apply to each metric
-df["Color Category WSEL"]  = df["Status"].apply(categorize_by_status)
-df["Color Category VolAF"] = df["Status"].apply(categorize_by_status)
-df["Color Category VolPct"] = df["Status"].apply(categorize_by_status)
 
 # Color map (simple)
 color_map = {
@@ -660,7 +726,8 @@ color_map = {
 }
 
 
-df_sorted = df.sort_values(by='Directory')
+# Merged frames are already sorted by Directory; sorting again would copy every column
+df_sorted = df if df["Directory"].is_monotonic_increasing else df.sort_values(by='Directory')
 
 # Create numeric index for x-axis labels
 df_sorted = df_sorted.reset_index(drop=True)
@@ -672,86 +739,180 @@ df_sorted["Storm Number"] = df_sorted.index + 1
 # Plot for Max WSEL Err
 #------------------------------
 
-fig_max_wsel_er = px.bar(
-    df_sorted,
-    x="Storm Number", #    x="Directory",
-    y="Max WSEL Err",
+fig_max_wsel_er = dfig.cached_figure(
+    scenario_key, dfig.storm_bar_figure,
+    df_sorted["Storm Number"],
+    df_sorted["Max WSEL Err"],
+    df_sorted["Directory"],
     title="Max WSEL Error",
-    color="Color Category WSEL",
-    color_discrete_map=color_map,
-    hover_data={
-        "Directory": True,          # show full storm/scenario name on hover
-        "Storm Number": False        # don't repeat index in hover
-    }
+    y_title="Max WSEL Err",
+    groups=df_sorted["Status Class"],
+    group_colors=color_map,
+    threshold=agg["p95"].get("Max WSEL Err"),
+    individual_groups=["Running", "Failed", "Other"],
+    mode=chart_mode,
+    max_points=chart_max_points,
+    y_range=[0, 20],
 )
-fig_max_wsel_er.update_yaxes(range=[0, 20])
 
-st.plotly_chart(fig_max_wsel_er, config={"responsive": True})
+plot_chart("Max WSEL Err", fig_max_wsel_er, config={"responsive": True})
 
 
 #------------------------------
 # Plot for Vol Error (AF)
 #------------------------------
 
-fig_vol_af = px.bar(
-    df_sorted,
-    x="Storm Number", #    x="Directory",
-    y="Vol Error (AF)",
+fig_vol_af = dfig.cached_figure(
+    scenario_key, dfig.storm_bar_figure,
+    df_sorted["Storm Number"],
+    df_sorted["Vol Error (AF)"],
+    df_sorted["Directory"],
     title="Volume Error (AF)",
-    color="Color Category VolAF",
-    color_discrete_map=color_map,
-    hover_data={
-        "Directory": True,          # show full storm/scenario name on hover
-        "Storm Number": False        # don't repeat index in hover
-    }
-
+    y_title="Vol Error (AF)",
+    groups=df_sorted["Status Class"],
+    group_colors=color_map,
+    threshold=agg["p95"].get("Vol Error (AF)"),
+    individual_groups=["Running", "Failed", "Other"],
+    mode=chart_mode,
+    max_points=chart_max_points,
+    y_range=[0, 100000],
 )
-fig_vol_af.update_yaxes(range=[0, 100000])
-st.plotly_chart(fig_vol_af, config={"responsive": True})
+plot_chart("Vol Error (AF)", fig_vol_af, config={"responsive": True})
 
 
 #------------------------------
 # Plot for Vol Error (%)
 #------------------------------
 
-fig_vol_pct = px.bar(
-    df_sorted,
-    x="Storm Number", #    x="Directory",
-    y="Vol Error (%)",
+fig_vol_pct = dfig.cached_figure(
+    scenario_key, dfig.storm_bar_figure,
+    df_sorted["Storm Number"],
+    df_sorted["Vol Error (%)"],
+    df_sorted["Directory"],
     title="Volume Error (%)",
-    color="Color Category VolPct",
-    color_discrete_map=color_map,
-    hover_data={
-        "Directory": True,          # show full storm/scenario name on hover
-        "Storm Number": False        # don't repeat index in hover
-    }
-
+    y_title="Vol Error (%)",
+    groups=df_sorted["Status Class"],
+    group_colors=color_map,
+    threshold=agg["p95"].get("Vol Error (%)"),
+    individual_groups=["Running", "Failed", "Other"],
+    mode=chart_mode,
+    max_points=chart_max_points,
+    y_range=[0, 2],
 )
-fig_vol_pct.update_yaxes(range=[0, 2])
-st.plotly_chart(fig_vol_pct, config={"responsive": True})
+plot_chart("Vol Error (%)", fig_vol_pct, config={"responsive": True})
+
+
+
+# =============================================================================
+# Cluster throughput and concurrency (from Start/End times)
+# =============================================================================
 
+# Fragment with a lazy expander: the timeline is only computed while it is open
+@st.fragment
+@diag.timed_fragment()
+def timeline_section(scenario_key, df, total_simulations, start_date, completion_date_prj):
+    timeline_expander = st.expander("Cluster Throughput and Concurrency", key="show_timeline", on_change="rerun")
+    if not timeline_expander.open:
+        return
+
+    with timeline_expander:
+        with diag.span("compute_timeline"):
+            timeline = du.compute_timeline(df, total_simulations, reference=start_date)
+        if pd.isna(timeline["first_start"]):
+            st.info("No parsable Start/End times for this scenario.")
+            return
+
+        eta = timeline["eta"]
+        col1, col2, col3 = st.columns(3, gap="medium")
+        with col1:
+            st.metric("Peak Running Jobs", f"{timeline['peak_running']:,}")
+        with col2:
+            st.metric("Completions per Hour (last 24 h)", f"{timeline['rate_per_hour']:.1f}")
+        with col3:
+            if eta is None:
+                st.metric("Projected Completion", "Unknown")
+            else:
+                st.metric(
+                    "Projected Completion", eta.strftime('%d %b %Y %H:%M'),
+                    delta=f"{(eta - pd.Timestamp(completion_date_prj)) / pd.Timedelta(days=1):+.1f} days vs plan",
+                    delta_color="inverse",
+                )
+        st.caption(f"{timeline['remaining']:,} runs remaining; runs from "
+                   f"{timeline['first_start']:%d %b %Y %H:%M} to {timeline['last_end']:%d %b %Y %H:%M}.")
+
+        running = timeline["running_per_interval"]
+        plot_chart("running jobs", dfig.cached_figure(scenario_key, dfig.running_jobs_figure, running.index, running))
+
+        throughput = timeline["throughput"]
+        plot_chart("throughput", dfig.cached_figure(
+            scenario_key, dfig.throughput_figure,
+            throughput.index, throughput["Completions"], throughput["SU Burn (SU/h)"],
+        ))
+
+
+timeline_section(scenario_key, df, total_simulations, scenario_cfg["start_date"],
+                 scenario_cfg["completion_date_projected"])
 
 
 # =============================================================================
 # Status Table
 # =============================================================================
-for cols in ['Color Category WSEL', 'Color Category VolAF','Color Category VolPct', 'Max Cum PRCP (inc)']:
-    if cols in df.columns:
-        del df[cols]
 
-df = df.rename(columns={
-    'Duration': 'CPU Runtime (hrs)',
-    'Max WSEL Err': 'WSEL Error Max (ft)',
-    'Start Time': 'CPU Start Time',
-    'End Time': 'CPU End Time'
-})
+# Fragment: searching, sorting and paging the table reruns only this section
+@st.fragment
+@diag.timed_fragment()
+def status_table_section(df):
+    df = df.drop(columns=[c for c in ['Status Class', 'Max Cum PRCP (inc)'] if c in df.columns])
+
+    df = df.rename(columns={
+        'Duration': 'CPU Runtime (hrs)',
+        'Max WSEL Err': 'WSEL Error Max (ft)',
+        'Start Time': 'CPU Start Time',
+        'End Time': 'CPU End Time'
+    })
+
+
+    # Status table: filtered, sorted and paginated here so only the visible page is styled and sent
+    st.subheader("Status Table")
+
+    col1, col2, col3 = st.columns([2, 1, 1], gap="medium")
+    with col1:
+        table_search = st.text_input("Search Directory, Status or Failure Reason", key="table_search")
+    with col2:
+        table_sort_by = st.selectbox("Sort by", options=list(df.columns), key="table_sort_by")
+    with col3:
+        table_sort_order = st.selectbox("Order", options=["Ascending", "Descending"], key="table_sort_order")
+
+    col1, col2 = st.columns([1, 1], gap="medium")
+    with col1:
+        table_page_size = st.selectbox("Rows per page", options=[50, 100, 250, 500], index=1, key="table_page_size")
+
+    with diag.span("query_status_table"):
+        table_df = du.query_status_table(
+            df,
+            search=table_search,
+            sort_by=table_sort_by,
+            ascending=(table_sort_order == "Ascending"),
+        )
+    table_matches = len(table_df)
+    table_pages = max(1, -(-table_matches // table_page_size))
+
+    # Back to the first page when a new search leaves fewer pages
+    if st.session_state.get("table_page", 1) > table_pages:
+        st.session_state.table_page = 1
+    with col2:
+        table_page = st.number_input("Page", min_value=1, max_value=table_pages, step=1, key="table_page")
+
+    first_row = (table_page - 1) * table_page_size
+    page_df = table_df.iloc[first_row:first_row + table_page_size]
 
+    with diag.span("status table page", rows=len(page_df)):
+        st.dataframe(du.style_status_table(page_df))
+    st.caption(f"Rows {min(first_row + 1, table_matches):,}–{min(first_row + table_page_size, table_matches):,} "
+               f"of {table_matches:,} matching ({len(df):,} total)")
 
-# Status table
-styled_df = df.style.apply(highlight_status, axis=1)
 
-st.subheader("Status Table")
-st.dataframe(styled_df)
+status_table_section(df)
 
 #------------------------------
 # Available Plan to Review
@@ -768,12 +929,6 @@ download_url = "https://raw.githubusercontent.com/akhalid-twi/COJ-production/a6f
 #------------------------------
 # Hydrodynamic and forcing plots
 #------------------------------
-st.subheader("Hydrodynamic Model Outputs and Forcings")
-
-# Convert relevant columns to numeric
-for col in df.columns:
-    if col not in ['Directory','Status','Failure Reason','Start Time','End Time']:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
 
 # Plot each metric with units in y-axis label
 metrics_with_units = {
@@ -789,108 +944,55 @@ metrics_with_units = {
 }
 
 
-# Create numeric index for plotting
-df = df.reset_index(drop=True)
-df["Storm Number"] = df.index + 1
-
-for col, title in metrics_with_units.items():
-
-    if col in df.columns:
-
-        mean_val = round(df[col].quantile(0.95), 2)
-
-        colors = [
-            'purple' if val > mean_val else 'steelblue'
-            for val in df[col]
-        ]
-
-        fig = go.Figure()
-
-        # Main bars
-        fig.add_trace(go.Bar(
-            x=df["Storm Number"],
-            y=df[col],
-            marker_color=colors,
-            name=col,
-            customdata=df[["Directory"]],
-            hovertemplate=
-                "<b>Storm:</b> %{customdata[0]}<br>" +
-                f"<b>{title}:</b> %{{y}}<extra></extra>"
-        ))
-
-        # 95% threshold line
-        fig.add_trace(go.Scatter(
-            x=df["Storm Number"],
-            y=[mean_val] * len(df),
-            mode='lines',
-            line=dict(color='black', dash='dash'),
-            name='95%'
-        ))
-
-        # Dummy traces for legend
-        fig.add_trace(go.Bar(
-            x=[None],
-            y=[None],
-            marker_color='purple',
-            name='Above 95%'
-        ))
-
-        fig.add_trace(go.Bar(
-            x=[None],
-            y=[None],
-            marker_color='steelblue',
-            name='Below 95%'
-        ))
-
-        fig.update_layout(
-            title=title,
-            xaxis_title="Storm Number",
-            yaxis_title=title,
-            showlegend=True
-        )
-
-        ymax = mean_val * 1.5
-        fig.update_yaxes(range=[0, ymax])
-
-        if col == 'Max Cum PRCP (in)':
-            fig.update_yaxes(range=[0, 100])
-
-        elif col == 'Max Stage BC (ft)':
-            fig.update_yaxes(range=[0, 15])
-
-        st.plotly_chart(fig, config={"responsive": True})
-
-
-#--------------------------
-# correlation metrics
-#--------------------------
-
-success_df = df[df["Status"] == "SUCCESS"].copy()
-
-success_df_clean = success_df.copy()
-for cols in ['SUs','Max WSE (ft)','Failure Info','Failure Reason']:
-    if cols in success_df_clean.columns:
-        del success_df_clean[cols]
-
-st.subheader("Correlation Metrics")
-#print(success_df_clean.columns)
-
-
-# rearrange columns
-success_df_clean = success_df_clean[['Vol Error (%)','Vol Error (AF)','Max Depth (ft)',
-                                     'Max Volume (ft^3)',
-                                     'Max Flow Balance (ft^3/s)', 'Max Stage BC (ft)',
-                                     'Max Inflow BC (cfs)', 'Max Cum PRCP (in)']]
-
-
-corr_matrix = success_df_clean.select_dtypes(include='number').corr()
-fig_corr = go.Figure(data=go.Heatmap(
-     z=corr_matrix.values,
-     x=corr_matrix.columns,
-     y=corr_matrix.columns,
-     colorscale='Viridis'
- ))
-st.plotly_chart(fig_corr)
-
-# We reached here without exception; clear the change flag so spinner doesnot reappear
-st.session_state.scenario_changed = False
+# Fragment with a lazy expander: the six charts are only built while it is open,
+# and opening or closing it reruns only this section
+@st.fragment
+@diag.timed_fragment()
+def hydro_section(scenario_key, df, p95_values, chart_mode, chart_max_points):
+    hydro_expander = st.expander("Hydrodynamic Model Outputs and Forcings", key="show_hydro", on_change="rerun")
+    if not hydro_expander.open:
+        return
+
+    with hydro_expander:
+        # Create numeric index for plotting (a shallow copy; metrics are already numeric)
+        df = df.reset_index(drop=True)
+        df["Storm Number"] = df.index + 1
+
+        for col, title in metrics_with_units.items():
+
+            if col in df.columns:
+
+                p95 = p95_values.get(col)
+                mean_val = round(p95, 2) if p95 is not None else np.nan
+
+                # Fixed axes for the precipitation and stage, 1.5x the p95 otherwise
+                if col == 'Max Cum PRCP (in)':
+                    y_range = [0, 100]
+                elif col == 'Max Stage BC (ft)':
+                    y_range = [0, 15]
+                else:
+                    y_range = [0, mean_val * 1.5]
+
+                fig = dfig.cached_figure(
+                    scenario_key, dfig.storm_bar_figure,
+                    df["Storm Number"],
+                    df[col],
+                    df["Directory"],
+                    title=title,
+                    y_title=title,
+                    groups=np.where(df[col] > mean_val, "Above 95%", "Below 95%"),
+                    group_colors={"Above 95%": "purple", "Below 95%": "steelblue"},
+                    threshold=mean_val,
+                    threshold_label="95%",
+                    mode=chart_mode,
+                    max_points=chart_max_points,
+                    y_range=y_range,
+                    showlegend=True,
+                )
+
+                plot_chart(col, fig, config={"responsive": True})
+
+
+hydro_section(scenario_key, df, agg["p95"], chart_mode, chart_max_points)
+
+finish_rerun()
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Headless JSON status of the production scenarios, for alerts, submission
+scripts and reports that should neither scrape the dashboard nor download the
+summary CSVs themselves. Run next to (or instead of) the dashboard:
+
+    python status_api.py --port 8503
+
+    GET /api/scenarios          every scenario, in registry order
+    GET /api/scenarios/<key>    one scenario
+    GET /api/health             when the data was last refreshed
+
+Each scenario reports its counts, progress, SU total and failures by status
+and by reason (see dashboard_scenarios.scenario_status). Data comes from the
+same kind of background prefetcher as the dashboard (COJ_ROOT_DIR and friends
+apply), so requests do no file or network I/O. Responses carry an ETag of
+their content; a client that sends it back in If-None-Match gets an empty
+304 until the data changes.
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import dashboard_diagnostics as diag
+import dashboard_scenarios as ds
+
+
+API_PREFIX = "/api"
+
+ENDPOINTS = [f"{API_PREFIX}/scenarios", f"{API_PREFIX}/scenarios/<key>", f"{API_PREFIX}/health"]
+
+# Seconds the server waits for the first refresh before answering requests
+READY_TIMEOUT = 120
+
+
+# =============================================================================
+# Routes
+# =============================================================================
+
+def scenarios_status(prefetcher) -> dict:
+    manifest = ds.current_manifest(prefetcher)
+    loaded = dict(prefetcher.load_portfolio(ds.SCENARIOS, manifest))
+    scenarios, errors = [], {}
+    for key in ds.SCENARIOS:
+        if isinstance(loaded[key], Exception):
+            errors[key] = repr(loaded[key])
+        else:
+            scenarios.append(ds.scenario_status(key, loaded[key], manifest))
+    return {"scenarios": scenarios, "errors": errors}
+
+
+def scenario_status(prefetcher, scenario_key: str) -> dict:
+    manifest = ds.current_manifest(prefetcher)
+    return ds.scenario_status(scenario_key, prefetcher.load_aggregates(scenario_key, manifest), manifest)
+
+
+def health(prefetcher) -> dict:
+    refreshed = prefetcher.refreshed
+    return {
+        "root_dir": prefetcher.root_dir,
+        "ready": prefetcher.ready,
+        "refreshed": datetime.fromtimestamp(refreshed, tz=timezone.utc).isoformat() if refreshed else None,
+        "refresh_interval_s": None if ds.LOCAL_MODE else prefetcher.interval,
+        "errors": {key: repr(e) for key, e in prefetcher.errors.items()},
+    }
+
+
+def route(prefetcher, path: str):
+    """
+    (HTTP status, JSON payload) of a GET request path.
+    """
+    path = path.rstrip("/")
+    if path == f"{API_PREFIX}/scenarios":
+        return HTTPStatus.OK, scenarios_status(prefetcher)
+    if path.startswith(f"{API_PREFIX}/scenarios/"):
+        scenario_key = path[len(f"{API_PREFIX}/scenarios/"):]
+        if scenario_key not in ds.SCENARIOS:
+            return HTTPStatus.NOT_FOUND, {"error": f"unknown scenario '{scenario_key}'",
+                                          "scenarios": list(ds.SCENARIOS)}
+        return HTTPStatus.OK, scenario_status(prefetcher, scenario_key)
+    if path == f"{API_PREFIX}/health":
+        return HTTPStatus.OK, health(prefetcher)
+    return HTTPStatus.NOT_FOUND, {"error": "not found", "endpoints": ENDPOINTS}
+
+
+# =============================================================================
+# Server
+# =============================================================================
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if not header:
+        return False
+    return header.strip() == "*" or etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+class StatusHandler(BaseHTTPRequestHandler):
+    server_version = "COJStatus/1.0"
+
+    def _respond(self, send_body: bool):
+        t0 = time.perf_counter()
+        try:
+            status, payload = route(self.server.prefetcher, urlsplit(self.path).path)
+        except Exception as e:
+            status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": repr(e)}
+
+        body = json.dumps(payload, separators=(",", ":"), default=str).encode()
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        not_modified = status == HTTPStatus.OK and _etag_matches(self.headers.get("If-None-Match"), etag)
+        self._ms = round((time.perf_counter() - t0) * 1000, 2)
+
+        self.send_response(HTTPStatus.NOT_MODIFIED if not_modified else status)
+        self.send_header("ETag", etag)
+        # Clients may keep the response but must revalidate it
+        self.send_header("Cache-Control", "no-cache")
+        if not not_modified:
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body and not not_modified:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def log_request(self, code="-", size="-"):
+        # One JSON line per request instead of the default access log
+        diag.log_event("api", method=self.command, path=self.path, status=int(code),
+                       ms=getattr(self, "_ms", None), client=self.client_address[0])
+
+
+def make_server(host: str, port: int, prefetcher) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), StatusHandler)
+    server.daemon_threads = True
+    server.prefetcher = prefetcher
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the status of the production scenarios as JSON.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (0.0.0.0 for all)")
+    parser.add_argument("--port", type=int, default=8503)
+    args = parser.parse_args(argv)
+
+    diag.configure_logging()
+    prefetcher = ds.start_prefetcher()
+    if not prefetcher.wait_ready(READY_TIMEOUT):
+        print(f"⚠️ Data of {ds.ROOT_DIR} not loaded after {READY_TIMEOUT} s; serving anyway", file=sys.stderr)
+
+    server = make_server(args.host, args.port, prefetcher)
+    print(f"Serving {ds.ROOT_DIR} on http://{args.host}:{server.server_port}{API_PREFIX}/scenarios", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())